@@ -0,0 +1,52 @@
+"""
+Peak RSS and retained AST memory of parsing a generated program with about the given number of AST nodes.
+
+Usage: python3 benchmarks/ast_memory.py [nodes]
+"""
+import resource
+import sys
+import tracemalloc
+from pathlib import Path
+
+src_path = Path(__file__).parent.parent
+sys.path.insert(0, str(src_path / 'src'))
+
+from regex.regex_ import RegParser
+from tokenizer.tokenizer import Tokenizer
+from tokenizer.token_matchers import matches
+from _parser import Parser
+
+# Nodes of each generated function: its declaration, 2 statements and their expressions
+function_nodes = 20
+
+
+def program(nodes: int) -> str:
+    functions = [f"fun f{i}(x: Int): Int {{ var y: Int = x * {i} + f{i}(x - 1); return y - x / 2; }}"
+                 for i in range(nodes // function_nodes)]
+    return '\n'.join(functions) + "\nfun main(): Null { }\n"
+
+
+def count(node) -> int:
+    if isinstance(node, list | tuple):
+        return sum(count(item) for item in node)
+    if not hasattr(node, '__dataclass_fields__'):
+        return 0
+    return 1 + sum(count(getattr(node, field)) for field in node.__dataclass_fields__)
+
+
+if __name__ == '__main__':
+    nodes = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+
+    RegParser(path=src_path / 'binaries/reg_parser')
+    tokenizer = Tokenizer(matches, path=src_path / 'binaries/tokenizer')
+    parser = Parser(src_path / 'binaries/grammar_parser')
+
+    tokens = tokenizer.tokenize(program(nodes))
+    tracemalloc.start()
+    ast = parser.parse(tokens)
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    print(f"nodes: {count(ast)}")
+    print(f"retained by the AST: {retained / 2 ** 20:.1f} MB")
+    print(f"peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2 ** 10:.1f} MB")
@@ -0,0 +1,79 @@
+"""
+Time of the Monte Carlo heuristic of the Taxi example, transpiled with and without the lowering of builtin calls.
+
+Usage: python3 benchmarks/intrinsics.py [people] [calls] [runs]
+"""
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+src_path = Path(__file__).parent.parent
+sys.path.insert(0, str(src_path / 'src'))
+
+from builtin.builtin import Builtins
+from checker import TypeChecker
+from errors import Error
+from optimizer import PassManager
+from regex.regex_ import RegParser
+from tokenizer.tokenizer import Tokenizer
+from tokenizer.token_matchers import matches
+from transpiler.transpiler import Transpiler
+from _parser import Parser
+
+# Evaluates the heuristic of a taxi over people placed at random on a grid, in the generated program
+evaluation = '''
+import random, runpy, sys, time
+sys.path.insert(0, sys.argv[1])
+program = runpy.run_path(sys.argv[1] + '/__main__.py', run_name='program')
+people, calls = map(int, sys.argv[2:])
+random.seed(0)
+places = {f'p{i}': program['Position'](random.randint(0, 100), random.randint(0, 100)) for i in range(people)}
+graph = {place: {} for place in places}
+objectives = [program['Person'](i, place, random.choice(list(places)), random.randint(1, 1000), 1000)
+              for i, place in enumerate(places)]
+env = program['MapEnvironment'](graph, {}, places, {})
+taxi = program['Taxi'](0, 'p0')
+heuristic = program['TaxiHeuristic']()
+start = time.perf_counter()
+for _ in range(calls):
+    heuristic.heuristic(objectives, taxi, env)
+print(time.perf_counter() - start)
+'''
+
+
+def generate(ast, types, intrinsics: bool, directory: str) -> None:
+    shutil.copytree(src_path / 'src/src', f'{directory}/builtin')
+    with open(f'{directory}/__main__.py', 'w') as f:
+        f.write('\n'.join(["from builtin import *", '\n', *Transpiler(types, intrinsics).transpile(ast)]))
+
+
+if __name__ == '__main__':
+    people = sys.argv[1] if len(sys.argv) > 1 else '50'
+    calls = sys.argv[2] if len(sys.argv) > 2 else '2000'
+    runs = sys.argv[3] if len(sys.argv) > 3 else '5'
+
+    RegParser(path=src_path / 'binaries/reg_parser')
+    tokenizer = Tokenizer(matches, path=src_path / 'binaries/tokenizer')
+    parser = Parser(src_path / 'binaries/grammar_parser')
+    program = (src_path / 'examples/Taxi/program.kt').read_text()
+    ast = parser.parse(tokenizer.tokenize(program))
+    Builtins(path=src_path / 'binaries/builtin')
+    checker = TypeChecker(Error(program))
+    checker.start(ast)
+    ast = PassManager(1, checker.types).run(ast)
+
+    print(f"{calls} evaluations over {people} people, best of {runs} runs")
+    # The versions run alternately and the best time of each is kept, to even out the noise of the machine.
+    times = {'calls': [], 'lowered': []}
+    with tempfile.TemporaryDirectory() as calls_dir, tempfile.TemporaryDirectory() as lowered_dir:
+        generate(ast, checker.types, False, calls_dir)
+        generate(ast, checker.types, True, lowered_dir)
+        for _ in range(int(runs)):
+            for version, directory in (('calls', calls_dir), ('lowered', lowered_dir)):
+                result = subprocess.run([sys.executable, '-c', evaluation, directory, people, calls],
+                                        check=True, capture_output=True, text=True)
+                times[version].append(float(result.stdout))
+    for version in times:
+        print(f"{version}: {min(times[version]) * 1000:.0f} ms")
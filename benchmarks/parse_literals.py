@@ -0,0 +1,52 @@
+"""
+Times tokenizing and parsing programs with generated array, dictionary and argument lists of growing size.
+
+Usage: python3 benchmarks/parse_literals.py [sizes...]
+"""
+import sys
+import time
+from pathlib import Path
+
+src_path = Path(__file__).parent.parent
+sys.path.insert(0, str(src_path / 'src'))
+
+from regex.regex_ import RegParser
+from tokenizer.tokenizer import Tokenizer
+from tokenizer.token_matchers import matches
+from _parser import Parser
+
+
+def array_program(size: int) -> str:
+    return f"fun main(): Null {{ var a: List<Int> = [{', '.join(str(i) for i in range(size))}]; }}"
+
+
+def dict_program(size: int) -> str:
+    return f"fun main(): Null {{ var a: Dict<Int, Int> = {{{', '.join(f'{i}: {i}' for i in range(size))}}}; }}"
+
+
+def call_program(size: int) -> str:
+    return f"fun main(): Null {{ print({', '.join(str(i) for i in range(size))}); }}"
+
+
+def block_program(size: int) -> str:
+    return "fun main(): Null { " + ' '.join(f"var a{i}: Int = {i};" for i in range(size)) + " }"
+
+
+if __name__ == '__main__':
+    sizes = [int(size) for size in sys.argv[1:]] or [1000, 10000, 100000]
+
+    RegParser(path=src_path / 'binaries/reg_parser')
+    tokenizer = Tokenizer(matches, path=src_path / 'binaries/tokenizer')
+    parser = Parser(src_path / 'binaries/grammar_parser')
+
+    print(f"{'case':<8}{'size':>8}{'tokens':>10}{'tokenize (s)':>14}{'parse (s)':>12}")
+    for name, generate in [('array', array_program), ('dict', dict_program), ('call', call_program),
+                           ('block', block_program)]:
+        for size in sizes:
+            program = generate(size)
+            start = time.perf_counter()
+            tokens = tokenizer.tokenize(program)
+            tokenized = time.perf_counter()
+            parser.parse(tokens)
+            parsed = time.perf_counter()
+            print(f"{name:<8}{size:>8}{len(tokens):>10}{tokenized - start:>14.3f}{parsed - tokenized:>12.3f}")
@@ -0,0 +1,94 @@
+"""
+Time of switches over 2, 8 and 32 class cases, transpiled to match statements and to type dispatch.
+
+Usage: python3 benchmarks/switch_dispatch.py [calls] [runs]
+"""
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+src_path = Path(__file__).parent.parent
+sys.path.insert(0, str(src_path / 'src'))
+
+from builtin.builtin import Builtins
+from checker import TypeChecker
+from errors import Error
+from regex.regex_ import RegParser
+from tokenizer.tokenizer import Tokenizer
+from tokenizer.token_matchers import matches
+from transpiler.transpiler import Transpiler
+from _parser import Parser
+
+# Runs the main of the generated program and prints how long it took
+evaluation = '''
+import contextlib, io, runpy, sys, time
+sys.path.insert(0, sys.argv[1])
+program = runpy.run_path(sys.argv[1] + '/__main__.py', run_name='program')
+start = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    program['main']()
+print(time.perf_counter() - start)
+'''
+
+
+def program(cases: int, calls: int) -> str:
+    """
+    Program that switches over objects of every case class, and of a class that takes the default.
+    """
+    classes = '\n'.join(f"Base::C{i} {{ fun init(): Void {{ super.init(); }} }}" for i in range(cases))
+    switch = ' '.join(f"case C{i} {{ return {i}; }}" for i in range(cases))
+    objects = ', '.join(f"C{i}()" for i in range(cases))
+    return f"""
+class Base {{ fun init(): Void {{ }} }}
+{classes}
+fun pick(x: Base): Int {{
+    switch x: {switch} default {{ return -1; }}
+    return -2;
+}}
+fun main(): Void {{
+    var objects: List<Base> = [{objects}, Base()];
+    var total: Int = 0;
+    var i: Int = 0;
+    while (i < {calls}) {{
+        for (var x: objects) {{ total = total + pick(x); }}
+        i = i + 1;
+    }}
+    print(total);
+}}
+"""
+
+
+def generate(ast, dispatch: bool, directory: str) -> None:
+    shutil.copytree(src_path / 'src/src', f'{directory}/builtin')
+    with open(f'{directory}/__main__.py', 'w') as f:
+        f.write('\n'.join(["from builtin import *", '\n', *Transpiler(dispatch=dispatch).transpile(ast)]))
+
+
+if __name__ == '__main__':
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    RegParser(path=src_path / 'binaries/reg_parser')
+    tokenizer = Tokenizer(matches, path=src_path / 'binaries/tokenizer')
+    parser = Parser(src_path / 'binaries/grammar_parser')
+    Builtins(path=src_path / 'binaries/builtin')
+
+    for cases in (2, 8, 32):
+        # The same number of switches runs for every number of cases
+        source = program(cases, calls // (cases + 1))
+        ast = parser.parse(tokenizer.tokenize(source))
+        TypeChecker._instances.pop(TypeChecker, None)
+        TypeChecker(Error(source)).start(ast)
+        # The versions run alternately and the best time of each is kept, to even out the noise of the machine.
+        times = {'match': [], 'dispatch': []}
+        with tempfile.TemporaryDirectory() as match_dir, tempfile.TemporaryDirectory() as dispatch_dir:
+            generate(ast, False, match_dir)
+            generate(ast, True, dispatch_dir)
+            for _ in range(runs):
+                for version, directory in (('match', match_dir), ('dispatch', dispatch_dir)):
+                    result = subprocess.run([sys.executable, '-c', evaluation, directory],
+                                            check=True, capture_output=True, text=True)
+                    times[version].append(float(result.stdout))
+        print(f"{cases} cases: " + ', '.join(f"{version} {min(times[version]) * 1000:.0f} ms" for version in times))
@@ -0,0 +1,64 @@
+"""
+Best run time of a program transpiled from its text alone and from the types recorded by the checker.
+
+Usage: python3 benchmarks/typed_transpile.py [file] [runs]
+"""
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+src_path = Path(__file__).parent.parent
+sys.path.insert(0, str(src_path / 'src'))
+
+from builtin.builtin import Builtins
+from checker import TypeChecker
+from errors import Error
+from regex.regex_ import RegParser
+from tokenizer.tokenizer import Tokenizer
+from tokenizer.token_matchers import matches
+from transpiler.transpiler import Transpiler
+from _parser import Parser
+
+
+def prepare(code: [str], directory: str) -> None:
+    shutil.copytree(src_path / 'src/src', f'{directory}/builtin')
+    with open(f'{directory}/__main__.py', 'w') as f:
+        f.write('\n'.join(["from builtin import *", '\n', *code]))
+
+
+def run(directory: str) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, directory], check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    path = Path(sys.argv[1]) if len(sys.argv) > 1 else src_path / 'examples/Taxi/program.kt'
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    RegParser(path=src_path / 'binaries/reg_parser')
+    tokenizer = Tokenizer(matches, path=src_path / 'binaries/tokenizer')
+    parser = Parser(src_path / 'binaries/grammar_parser')
+    program = path.read_text()
+    ast = parser.parse(tokenizer.tokenize(program))
+    Builtins(path=src_path / 'binaries/builtin')
+    checker = TypeChecker(Error(program))
+    checker.start(ast)
+
+    untyped = Transpiler().transpile(ast)
+    typed = Transpiler(checker.types).transpile(ast)
+    changed = sum(a != b for a, b in zip(untyped, typed))
+    print(f"{path.name}: {changed} of {len(typed)} generated lines differ")
+    # The versions run alternately and the best time of each is kept, to even out the noise of the machine.
+    times = {'untyped': [], 'typed': []}
+    with tempfile.TemporaryDirectory() as untyped_dir, tempfile.TemporaryDirectory() as typed_dir:
+        prepare(untyped, untyped_dir)
+        prepare(typed, typed_dir)
+        for _ in range(runs):
+            times['untyped'].append(run(untyped_dir))
+            times['typed'].append(run(typed_dir))
+    for version in times:
+        print(f"{version}: {min(times[version]) * 1000:.0f} ms")
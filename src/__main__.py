@@ -1,15 +1,17 @@
+import argparse
 import os
 import shutil
-import sys
 
 from pathlib import Path
 
 from transpiler.transpiler import Transpiler
-from builtin.builtin import get_code
+from builtin.builtin import get_code, Builtins
 from regex.regex_ import RegParser
 from tokenizer.tokenizer import Tokenizer
 from _parser import Parser
 from checker import TypeChecker
+from optimizer import PassManager
+from runner import run
 from tokenizer.token_matchers import matches
 from errors import UnexpectedToken, Error
 from sys import stderr
@@ -18,14 +20,37 @@ from sys import stderr
 if __name__ == '__main__':
     
     src_path = Path(__file__).parent.parent
+
+    arg_parser = argparse.ArgumentParser(prog='src', description='Transpiles a .kt simulation program to Python.')
+    arg_parser.add_argument('file', nargs='?', help='program to compile (defaults to run/program.kt)')
+    arg_parser.add_argument('--errors', choices=['first', 'all', 'json'], default='first',
+                            help='stop at the first error, or report all of them as text or json')
+    arg_parser.add_argument('--jobs', type=int, default=1, help='processes used to tokenize, parse and check large programs')
+    arg_parser.add_argument('-O', dest='level', type=int, choices=[0, 1, 2], default=1,
+                            help='optimisation level: 0 for none, 1 to fold constants and dead branches and to lower '
+                                 'builtin calls, 2 to also share repeated expressions and hoist loop invariants')
+    arg_parser.add_argument('--no-slots', action='store_true',
+                            help='emit program classes with an instance __dict__ instead of __slots__')
+    arg_parser.add_argument('--switch', choices=['match', 'dispatch'], default='match',
+                            help='emit switches as match statements, or as a jump on a case cached for each type')
+    arg_parser.add_argument('--instrument', nargs='?', const='instrumentation.json', metavar='FILE',
+                            help='count the calls and time of every program function, and write them as json to '
+                                 'FILE when the program exits (instrumentation.json by default)')
+    arg_parser.add_argument('--allocations', action='store_true',
+                            help='with --instrument, also count the bytes each function leaves allocated')
+    arg_parser.add_argument('--run', action='store_true',
+                            help='run the program in this process instead of writing it to out, caching its compiled '
+                                 'code in binaries')
+    arg_parser.add_argument('--time-passes', action='store_true', help='print how long each optimisation pass took')
+    args = arg_parser.parse_args()
     
     if os.getenv("FILE"):
         path = Path('run') / os.getenv("FILE")
     else:
-        if len(sys.argv) > 1:
-            path = Path(sys.argv[1])
+        if args.file:
+            path = Path(args.file)
             if not path.is_file():
-                print(f"File \"{sys.argv[1]}\" not found", file=stderr)
+                print(f"File \"{args.file}\" not found", file=stderr)
                 exit(1)
         else:
             path = src_path / Path('run/program.kt')
@@ -41,30 +66,54 @@ if __name__ == '__main__':
     with open(path, 'r') as f:
         program = f.read()
 
-    tokens = tokenizer.tokenize(program)
+    tokens = tokenizer.tokenize(program, workers=args.jobs)
 
     parser = Parser(Path(src_path / 'binaries/grammar_parser').resolve())
 
-    error = Error(program)
+    error = Error(program, collect=args.errors != 'first', output_format='json' if args.errors == 'json' else 'text')
     ast = None
     try:
-        ast = parser.parse(tokens)
+        ast = parser.parse(tokens, workers=args.jobs)
     except UnexpectedToken as e:
-        error(f"Unexpected token found \"{tokens[e.index].text}\"", token=tokens[e.index])
+        error(f"Unexpected token found \"{tokens[e.index].text}\"", token=tokens[e.index], fatal=True)
 
+    Builtins(path=src_path / 'binaries/builtin')
     checker = TypeChecker(error)
-    transpiler = Transpiler()
+    transpiler = Transpiler(checker.types, intrinsics=args.level > 0, slots=not args.no_slots,
+                             dispatch=args.switch == 'dispatch', instrument=args.instrument,
+                             allocations=args.allocations)
+
+    checker.start(ast, workers=args.jobs)
+    error.report()
+
+    optimizer = PassManager(args.level, checker.types)
+    ast = optimizer.run(ast)
+    if args.time_passes:
+        print(optimizer.report(), file=stderr)
+
+    prefix = [f"from builtin import *", '\n']
+    # Generated lines mapped back to the program, to read profiles and tracebacks of the generated code
+    offset = sum(line.count('\n') + 1 for line in prefix)
 
-    checker.start(ast)
+    if args.run:
+        # The code runs under the path of the program, which the source map written for it maps from
+        source = str(path.resolve())
+        python_code = transpiler.transpile(ast)
+        os.makedirs(src_path / "out", exist_ok=True)
+        transpiler.source_map(source, source, offset).save(src_path / 'out/source_map.json')
+        run(python_code, source, path=src_path / 'binaries/code')
+        exit(0)
 
     if os.path.exists(src_path / "out"):
         shutil.rmtree(src_path / "out")
     os.makedirs(src_path / "out", exist_ok=True)
     code = get_code(src_path / Path('src/src/'))
 
-    python_code = [f"from builtin import *", '\n', *transpiler.transpile(ast)]
+    python_code = [*prefix, *transpiler.transpile(ast)]
     with open(src_path / 'out/__main__.py', 'w') as f:
         f.write('\n'.join(python_code))
+    transpiler.source_map(str(path.resolve()), str((src_path / 'out/__main__.py').resolve()), offset) \
+        .save(src_path / 'out/source_map.json')
 
     os.makedirs(src_path / "out/builtin", exist_ok=True)
     for file in code:
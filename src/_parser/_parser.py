@@ -1,11 +1,26 @@
+import io
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
 from lr_parser.lr1_parser import LR1Parser
-from lr_parser.grammar import Grammar, CreateTerminals, CreateNonTerminals, Terminal, Epsilon
+from lr_parser.grammar import Grammar, CreateTerminals, CreateNonTerminals, Terminal, Epsilon, identity, push
 from lr_parser.lr_utils import evaluate_reverse_parser
 from .nodes import *
 from tokenizer.token_ import Token, TokenType
 from tools import Singleton
 
 
+def add_case(cases: dict, name: Token, statements: list) -> dict:
+    cases[name] = statements
+    return cases
+
+
+def add_entry(entries: list, key: Node, value: Node) -> list:
+    entries[0].append(key)
+    entries[1].append(value)
+    return entries
+
+
 class Parser(metaclass=Singleton):
 
     def __init__(self, path=None):
@@ -28,14 +43,14 @@ class Parser(metaclass=Singleton):
                      *specials, *grouping, *punctuation, *boolean, comment]
 
         non_terminals \
-            = p_program, p_functions, p_statements, p_statement, p_if, p_else, p_while, p_fun_declaration, p_return, p_return_arg, \
+            = p_program, p_classes, p_functions, p_statements, p_statement, p_if, p_else, p_while, p_fun_declaration, p_return, p_return_arg, \
               p_params, p_more_params, p_var_declaration, p_var_type, p_assign, p_expression_s, p_expression, p_logic, p_logic_op, \
               p_equality, p_equality_op, p_comparison, p_comparison_op, p_term, p_term_op, \
               p_factor, p_factor_op, p_unary, p_unary_op, p_index, p_call, p_arguments, p_more_arguments, p_primary, \
               p_array, p_array_elem, p_more_array_elem, p_dict, p_dict_elem, p_more_dict_elem, \
               p_types, p_type, p_class, p_class_members, p_get, p_set, p_attr, p_superclass, \
               p_switch, p_cases, p_default, p_comment, p_for, p_continue, p_break \
-            = CreateNonTerminals("Program Functions Statements Statement If Else While FunDeclaration Return ReturnArg "
+            = CreateNonTerminals("Program Classes Functions Statements Statement If Else While FunDeclaration Return ReturnArg "
                                  "Params MoreParams VarDeclaration VarType Assign ExpressionS Expression Logic Logic_op "
                                  "Equality Equality_op Comparison Comparison_op Term Term_op "
                                  "Factor Factor_op Unary Unary_op Index Call Arguments MoreArguments Primary "
@@ -45,11 +60,11 @@ class Parser(metaclass=Singleton):
         e = Epsilon()
 
         productions = [
-            p_program > (p_class + p_program | p_functions,
-                         lambda x: [Statement(x[0]), *x[1]], lambda x: x[0], lambda x: []),
-            p_functions > (p_fun_declaration + p_functions | e,
-                           lambda x: [Statement(x[0]), *x[1]], lambda x: []),
-            p_statements > (p_statements + p_statement | e, lambda x: [*x[0], x[1]], lambda x: []),
+            p_program > (p_classes + p_functions, lambda x: x[0] + x[1]),
+            p_classes > (p_classes + p_class | e, lambda x: push(x[0], Statement(x[1])), lambda x: []),
+            p_functions > (p_functions + p_fun_declaration | e,
+                           lambda x: push(x[0], Statement(x[1])), lambda x: []),
+            p_statements > (p_statements + p_statement | e, lambda x: push(x[0], x[1]), lambda x: []),
             p_statement > (p_if | p_while | p_var_declaration | p_assign | p_return | p_expression_s | p_attr
                            | p_switch | p_comment | p_for | p_continue | p_break,
                            lambda x: Statement(x[0]),
@@ -75,8 +90,8 @@ class Parser(metaclass=Singleton):
 
             p_switch > (switch + identifier + colon + case + identifier + open_b + p_statements + close_b + p_cases + p_default,
                         lambda x: SwitchNode(x[1], {x[4]: x[6], **x[8]}, x[9])),
-            p_cases > (case + identifier + open_b + p_statements + close_b + p_cases | e,
-                       lambda x: {x[1]: x[3], **x[5]}, lambda x: dict()),
+            p_cases > (p_cases + case + identifier + open_b + p_statements + close_b | e,
+                       lambda x: add_case(x[0], x[2], x[4]), lambda x: dict()),
             p_default > (default + open_b + p_statements + close_b | e, lambda x: x[2], lambda x: []),
 
             p_class > (class_s + identifier + p_superclass + open_b + p_class_members + close_b |
@@ -84,7 +99,7 @@ class Parser(metaclass=Singleton):
                        lambda x: ClassNode(x[1], x[2], x[4]),
                        lambda x: ClassNode(x[3], x[0], x[5])),
             p_superclass > (colon + identifier | e, lambda x: x[1], lambda x: None),
-            p_class_members > (p_fun_declaration + p_class_members | e, lambda x: [x[0], *x[1]], lambda x: []),
+            p_class_members > (p_class_members + p_fun_declaration | e, lambda x: push(x[0], x[1]), lambda x: []),
 
             p_if > (if_s + open_p + p_expression + close_p + open_b + p_statements + close_b + p_else,
                     lambda x: If(x[0], x[2], x[5], x[7])),
@@ -109,26 +124,25 @@ class Parser(metaclass=Singleton):
                 fun_s + identifier + open_p + p_params + colon + p_type + open_b + p_statements + close_b,
                 lambda x: FunctionNode(x[1], x[3], x[5], x[7])),
 
-            p_params > (identifier + colon + p_type + p_more_params | close_p,
-                        lambda x: [(x[0], x[2]), *x[3]], lambda x: []),
-            p_more_params > (comma + identifier + colon + p_type + p_more_params | close_p,
-                             lambda x: [(x[1], x[3]), *x[4]], lambda x: []),
+            p_params > (p_more_params + close_p | close_p, lambda x: x[0], lambda x: []),
+            p_more_params > (p_more_params + comma + identifier + colon + p_type | identifier + colon + p_type,
+                             lambda x: push(x[0], (x[2], x[4])), lambda x: [(x[0], x[2])]),
 
             p_return > (return_s + p_return_arg, lambda x: Return(x[0], x[1])),
-            p_return_arg > (p_expression + semicolon | semicolon, lambda x: x[0], lambda x: None),
+            p_return_arg > (p_expression + semicolon | semicolon, identity, lambda x: None),
 
-            p_expression_s > (p_expression + semicolon, lambda x: x[0]),
-            p_expression > (p_logic, lambda x: x[0]),
-            p_logic > (p_logic + p_logic_op + p_equality | p_equality, lambda x: Binary(*x), lambda x: x[0]),
+            p_expression_s > (p_expression + semicolon, identity),
+            p_expression > (p_logic, identity),
+            p_logic > (p_logic + p_logic_op + p_equality | p_equality, lambda x: Binary(*x), identity),
             p_equality > (
-                p_equality + p_equality_op + p_comparison | p_comparison, lambda x: Binary(*x), lambda x: x[0]),
-            p_comparison > (p_comparison + p_comparison_op + p_term | p_term, lambda x: Binary(*x), lambda x: x[0]),
-            p_term > (p_term + p_term_op + p_factor | p_factor, lambda x: Binary(*x), lambda x: x[0]),
-            p_factor > (p_factor + p_factor_op + p_unary | p_unary, lambda x: Binary(*x), lambda x: x[0]),
-            p_unary > (p_unary_op + p_unary | p_call, lambda x: Unary(*x), lambda x: x[0]),
+                p_equality + p_equality_op + p_comparison | p_comparison, lambda x: Binary(*x), identity),
+            p_comparison > (p_comparison + p_comparison_op + p_term | p_term, lambda x: Binary(*x), identity),
+            p_term > (p_term + p_term_op + p_factor | p_factor, lambda x: Binary(*x), identity),
+            p_factor > (p_factor + p_factor_op + p_unary | p_unary, lambda x: Binary(*x), identity),
+            p_unary > (p_unary_op + p_unary | p_call, lambda x: Unary(*x), identity),
             p_call > (p_primary | p_get,
-                      lambda x: x[0],
-                      lambda x: x[0]),
+                      identity,
+                      identity),
             p_primary > (
                 integer | _float | string | true_i | false_i | null_i | open_p + p_logic + close_p | p_array | p_dict,
                 lambda x: Literal(int(x[0].text)),
@@ -138,41 +152,44 @@ class Parser(metaclass=Singleton):
                 lambda x: Literal(False),
                 lambda x: Literal(None),
                 lambda x: Grouping(x[1]),
-                lambda x: x[0],
-                lambda x: x[0]),
+                identity,
+                identity),
 
             p_set > (p_get + dot + identifier | identifier | p_index,
-                     lambda x: GetNode(x[0], x[2]), lambda x: Variable(x[0]), lambda x: x[0]),
+                     lambda x: GetNode(x[0], x[2]), lambda x: Variable(x[0]), identity),
             p_get > (
                 p_get + dot + identifier | p_get + open_p + p_arguments + close_p | identifier | _self | _super | p_index,
                 lambda x: GetNode(x[0], x[2]), lambda x: Call(x[0], x[2], x[1].line),
-                lambda x: Variable(x[0]), lambda x: SelfNode(x[0]), lambda x: SuperNode(x[0]), lambda x: x[0]),
+                lambda x: Variable(x[0]), lambda x: SelfNode(x[0]), lambda x: SuperNode(x[0]), identity),
             p_index > (p_call + open_br + p_expression + close_br, lambda x: Index(x[0], x[2])),
 
-            p_arguments > (p_expression + p_more_arguments | e, lambda x: [x[0], *x[1]], lambda x: []),
-            p_more_arguments > (comma + p_expression + p_more_arguments | e, lambda x: [x[1], *x[2]], lambda x: []),
+            p_arguments > (p_more_arguments | e, identity, lambda x: []),
+            p_more_arguments > (p_more_arguments + comma + p_expression | p_expression,
+                                lambda x: push(x[0], x[2]), lambda x: [x[0]]),
 
             p_array > (open_br + p_array_elem + close_br, lambda x: ArrayNode(x[0], x[1])),
-            p_array_elem > (p_expression + p_more_array_elem | e, lambda x: [x[0], *x[1]], lambda x: []),
-            p_more_array_elem > (comma + p_expression + p_more_array_elem | e, lambda x: [x[1], *x[2]], lambda x: []),
+            p_array_elem > (p_more_array_elem | e, identity, lambda x: []),
+            p_more_array_elem > (p_more_array_elem + comma + p_expression | p_expression,
+                                 lambda x: push(x[0], x[2]), lambda x: [x[0]]),
 
             p_dict > (open_b + p_dict_elem + close_b, lambda x: DictionaryNode(x[0], *x[1])),
-            p_dict_elem > (p_expression + colon + p_expression + p_more_dict_elem | e,
-                           lambda x: [[x[0], *x[3][0]], [x[2], *x[3][1]]], lambda x: [[], []]),
-            p_more_dict_elem > (comma + p_expression + colon + p_expression + p_more_dict_elem | e,
-                                lambda x: [[x[1], *x[4][0]], [x[3], *x[4][1]]], lambda x: [[], []]),
+            p_dict_elem > (p_more_dict_elem | e, identity, lambda x: [[], []]),
+            p_more_dict_elem > (p_more_dict_elem + comma + p_expression + colon + p_expression
+                                | p_expression + colon + p_expression,
+                                lambda x: add_entry(x[0], x[2], x[4]), lambda x: [[x[0]], [x[2]]]),
 
-            p_logic_op > (and_operator | or_operator, lambda x: x[0], lambda x: x[0]),
-            p_equality_op > (equals_equals | different, lambda x: x[0], lambda x: x[0]),
+            p_logic_op > (and_operator | or_operator, identity, identity),
+            p_equality_op > (equals_equals | different, identity, identity),
             p_comparison_op > (greater | greaterequal | less | lessequal,
-                               lambda x: x[0], lambda x: x[0], lambda x: x[0], lambda x: x[0]),
-            p_term_op > (plus | minus, lambda x: x[0], lambda x: x[0]),
-            p_factor_op > (mul | div | mod, lambda x: x[0], lambda x: x[0], lambda x:x[0]),
-            p_unary_op > (exclamation | minus, lambda x: x[0], lambda x: x[0])
+                               identity, identity, identity, identity),
+            p_term_op > (plus | minus, identity, identity),
+            p_factor_op > (mul | div | mod, identity, identity, identity),
+            p_unary_op > (exclamation | minus, identity, identity)
         ]
 
         grammar = Grammar(non_terminals, terminals, p_program, productions)
 
+        self.path = path
         self.parser = LR1Parser(grammar, path=path)
         self.mapping = {
             TokenType.SELF: _self,
@@ -234,8 +251,107 @@ class Parser(metaclass=Singleton):
             mapped_tokens.append(terminal)
         return mapped_tokens
 
-    def parse(self, tokens: [Token]):
+    def parse(self, tokens: [Token], workers: int = 1):
+        if workers > 1:
+            return self.parallel_parse(tokens, workers)
         mapped_tokens = self._map_tokens_to_terminals(tokens)
         parsed, operations = self.parser(mapped_tokens)
         ast = evaluate_reverse_parser(parsed, operations, tokens + [self.parser.G.EOF])
         return ast
+
+    def parallel_parse(self, tokens: [Token], workers: int, min_tokens: int = 1 << 14):
+        """
+        Parses runs of top level declarations in a process pool and joins their statements. Any program the
+        chunks can not be split from, or that has a syntax error, is parsed sequentially.
+        """
+        chunks = split_declarations(tokens, workers * 4) if len(tokens) >= min_tokens else None
+        if not chunks or len(chunks) == 1:
+            return self.parse(tokens)
+        try:
+            with ProcessPoolExecutor(workers, initializer=init_worker, initargs=(self.path, tokens)) as pool:
+                results = list(pool.map(parse_chunk, chunks))
+        except Exception:
+            return self.parse(tokens)
+        ast = []
+        for result in results:
+            ast.extend(TokenUnpickler(io.BytesIO(result), tokens).load())
+        return ast
+
+
+def split_declarations(tokens: [Token], chunks: int) -> [(int, int)]:
+    """
+    Runs of consecutive top level declarations with about the same number of tokens. The declarations end where
+    the brace depth gets back to zero, and classes must come before functions as in the grammar. None when the
+    tokens can not be split that way.
+    """
+    ends = []
+    depth = 0
+    for i, token in enumerate(tokens):
+        if token.type == TokenType.OPEN_BRACES:
+            depth += 1
+        elif token.type == TokenType.CLOSE_BRACES:
+            depth -= 1
+            if depth < 0:
+                return None
+            if depth == 0:
+                ends.append(i + 1)
+    if not ends or ends[-1] != len(tokens) - 1:
+        return None
+    functions = False
+    for start in [0, *ends[:-1]]:
+        if tokens[start].type == TokenType.FUN:
+            functions = True
+        elif functions:
+            return None
+    
+    size = len(tokens) // chunks + 1
+    runs = []
+    start = 0
+    for end in ends:
+        if end - start >= size or end == ends[-1]:
+            runs.append((start, end))
+            start = end
+    return runs
+
+
+class TokenPickler(pickle.Pickler):
+    """
+    Pickles tokens by their position in the token list, so they are not copied back with the source.
+    """
+    def __init__(self, file, positions: {int: int}):
+        super().__init__(file)
+        self.positions = positions
+    
+    def persistent_id(self, obj):
+        if isinstance(obj, Token):
+            return self.positions.get(id(obj))
+        return None
+
+
+class TokenUnpickler(pickle.Unpickler):
+    
+    def __init__(self, file, tokens: [Token]):
+        super().__init__(file)
+        self.tokens = tokens
+    
+    def persistent_load(self, position: int) -> Token:
+        return self.tokens[position]
+
+
+worker_tokens: [Token] = []
+worker_positions: {int: int} = {}
+
+
+def init_worker(path, tokens: [Token]):
+    global worker_tokens, worker_positions
+    Parser(path)
+    worker_tokens = tokens
+    worker_positions = {id(token): i for i, token in enumerate(tokens)}
+
+
+def parse_chunk(bounds: (int, int)) -> bytes:
+    start, end = bounds
+    ast = Parser().parse(worker_tokens[start:end] + [worker_tokens[-1]])
+    result = io.BytesIO()
+    TokenPickler(result, worker_positions).dump(ast)
+    return result.getvalue()
@@ -1,93 +1,96 @@
 from dataclasses import dataclass
 from tokenizer.token_ import Token
+from tokenizer.token_type import TokenType
 from typing import Optional
 
 
 class Node:
+    __slots__ = ()
+
     def exec(self, interpreter):
         return interpreter.exec(self)
 
-    def check(self, checker):
-        return checker.check(self)
+    def check(self, checker, *args):
+        return checker.check(self, *args)
 
     def eval(self, transpiler, **kwargs):
         return transpiler.eval(self, **kwargs)
 
 
-@dataclass
+@dataclass(slots=True)
 class ArrayNode(Node):
     start: Token
     expressions: [Node]
 
 
-@dataclass
+@dataclass(slots=True)
 class DictionaryNode(Node):
     start: Token
     keys: [Node]
     values: [Node]
 
 
-@dataclass
+@dataclass(slots=True)
 class Index(Node):
     expression: Node
     index: Node
 
 
-@dataclass
+@dataclass(slots=True)
 class VarType(Node):
     type: Token
     nested: Optional['VarType'] = None
     s_nested: Optional['VarType'] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class Binary(Node):
     left: Node
     operator: Token
     right: Node
 
 
-@dataclass
+@dataclass(slots=True)
 class Unary(Node):
     operator: Token
     right: Node
 
 
-@dataclass
+@dataclass(slots=True)
 class Grouping(Node):
     expression: Node
 
 
-@dataclass
+@dataclass(slots=True)
 class Call(Node):
     called: Node
     arguments: [Node]
     line: int
 
 
-@dataclass
+@dataclass(slots=True)
 class Literal(Node):
     value: object
 
 
-@dataclass
+@dataclass(slots=True)
 class Variable(Node):
     name: Token
 
 
-@dataclass
+@dataclass(slots=True)
 class VarDeclaration(Node):
     name: Token
     type: VarType
     expression: Node
 
 
-@dataclass
+@dataclass(slots=True)
 class ExpressionStatement(Node):
     expression: Node
 
 
-@dataclass
+@dataclass(slots=True)
 class FunctionNode(Node):
     name: Token
     params: [(Token, VarType)]
@@ -95,13 +98,13 @@ class FunctionNode(Node):
     body: [Node]
 
 
-@dataclass
+@dataclass(slots=True)
 class Return(Node):
     start: Token
     expression: Node
 
 
-@dataclass
+@dataclass(slots=True)
 class If(Node):
     start: Token
     condition: Node
@@ -109,80 +112,118 @@ class If(Node):
     else_code: [Node]
 
 
-@dataclass
+@dataclass(slots=True)
 class While(Node):
     start: Token
     condition: Node
     code: [Node]
 
 
-@dataclass
+@dataclass(slots=True)
 class GetNode(Node):
     left: Node
     right: Token
 
 
-@dataclass
+@dataclass(slots=True)
 class Statement(Node):
     code: Node
 
 
-@dataclass
+@dataclass(slots=True)
 class ClassNode(Node):
     name: Token
     superclass: Token
     methods: [FunctionNode]
 
 
-@dataclass
+@dataclass(slots=True)
 class Assignment(Node):
     left: Variable | GetNode
     value: Node
     line: int
 
 
-@dataclass
+@dataclass(slots=True)
 class SelfNode(Node):
     token: Token
 
 
-@dataclass
+@dataclass(slots=True)
 class SuperNode(Node):
     token: Token
 
 
-@dataclass
+@dataclass(slots=True)
 class BreakNode(Node):
     token: Token
 
 
-@dataclass
+@dataclass(slots=True)
 class ContinueNode(Node):
     token: Token
 
 
-@dataclass
+@dataclass(slots=True)
 class AttrDeclaration(Node):
     name: Token
     type: VarType
     expression: Node
 
 
-@dataclass
+@dataclass(slots=True)
 class SwitchNode(Node):
     variable: Token
     switch_cases: {Token: [Node]}
     default: [Node]
 
 
-@dataclass
+@dataclass(slots=True)
 class CommentNode(Node):
     text: str
 
 
-@dataclass
+@dataclass(slots=True)
 class ForNode(Node):
     start: Token
     variable: Token
     iterable: Node
     statements: [Node]
+
+
+def leading_token(node: Node) -> Token | None:
+    """
+    First token of the node in source order, found through its fields in the order they were parsed.
+    """
+    for field in node.__slots__:
+        value = getattr(node, field)
+        if isinstance(value, Token):
+            return value
+        if isinstance(value, list) and value and isinstance(value[0], Node):
+            value = value[0]
+        if isinstance(value, Node):
+            token = leading_token(value)
+            if token:
+                return token
+    return None
+
+
+def identifiers(nodes: [Node]) -> {str}:
+    """
+    Names of every identifier token under the nodes.
+    """
+    names = set()
+    pending = list(nodes)
+    while pending:
+        value = pending.pop()
+        if isinstance(value, Token):
+            if value.type == TokenType.IDENTIFIER:
+                names.add(value.text)
+        elif isinstance(value, Node):
+            pending.extend(getattr(value, field) for field in value.__slots__)
+        elif isinstance(value, list | tuple):
+            pending.extend(value)
+        elif isinstance(value, dict):
+            pending.extend(value.keys())
+            pending.extend(value.values())
+    return names
@@ -1,3 +1,4 @@
+from bisect import bisect_right
 from typing import List, Dict, Tuple, Any
 import itertools as it
 
@@ -30,6 +31,48 @@ class Info:
         return f"Info: {self.info}"
 
 
+class CharClass(tuple):
+    """
+    Transition label that matches every character in its sorted and disjoint code point intervals.
+    """
+    
+    def __new__(cls, intervals):
+        merged = []
+        for low, high in sorted(intervals):
+            if merged and low <= merged[-1][1] + 1:
+                merged[-1] = (merged[-1][0], max(high, merged[-1][1]))
+            else:
+                merged.append((low, high))
+        return super().__new__(cls, merged)
+    
+    @classmethod
+    def of(cls, chars: str) -> "CharClass":
+        return cls((ord(c), ord(c)) for c in chars)
+    
+    def __contains__(self, c: str) -> bool:
+        code = ord(c)
+        k = bisect_right(self, code, key=lambda x: x[0]) - 1
+        return k >= 0 and code <= self[k][1]
+    
+    def __sub__(self, other: "CharClass") -> "CharClass":
+        intervals = []
+        for low, high in self:
+            for other_low, other_high in other:
+                if other_high < low or other_low > high:
+                    continue
+                if other_low > low:
+                    intervals.append((low, other_low - 1))
+                low = other_high + 1
+                if low > high:
+                    break
+            if low <= high:
+                intervals.append((low, high))
+        return CharClass(intervals)
+    
+    def __repr__(self):
+        return f"CharClass({', '.join(f'{chr(low)!r}-{chr(high)!r}' for low, high in self)})"
+
+
 class Automata:
     
     def __init__(self,
@@ -45,11 +88,29 @@ class Automata:
         self.initial_state = initial_state
         self.current = initial_state
         
+        self.index()
+    
+    def index(self):
         # Vocabulary
         self.vocabulary = set()
-        for (_, symbol) in transitions.keys():
+        # Character class transitions of each state, and the targets already found for each (state, char)
+        self.classes: Dict[int, List[Tuple[CharClass, Tuple[int]]]] = {}
+        self.memo: Dict[Tuple[int, str], int | None] = {}
+        for (state, symbol), targets in self.transitions.items():
             if symbol:
                 self.vocabulary.add(symbol)
+            if isinstance(symbol, CharClass):
+                self.classes.setdefault(state, []).append((symbol, targets))
+    
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        for derived in ('vocabulary', 'classes', 'memo'):
+            state.pop(derived, None)
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.index()
     
     def reset(self):
         self.current = self.initial_state
@@ -65,11 +126,28 @@ class Automata:
         return self.current in self.final_states.keys(), i - start_index
     
     def next(self, c: str):
-        current = self.transitions.get((self.current, c), [None])[0]
+        current = self.step(self.current, c)
         if current is not None:
             self.current = current
         return current is not None
     
+    def step(self, state: int, c: str) -> int | None:
+        key = (state, c)
+        if key not in self.memo:
+            self.memo[key] = self.target(state, c)
+        return self.memo[key]
+    
+    def target(self, state: int, c: str) -> int | None:
+        """
+        Deterministic transition on c, by its own label or by the only class of the state that contains it.
+        """
+        if (state, c) in self.transitions:
+            return self.transitions[(state, c)][0]
+        for label, targets in self.classes.get(state, ()):
+            if c in label:
+                return targets[0]
+        return None
+    
     def get_type(self, state):
         types = self.final_states.get(state)
         if not types:
@@ -91,6 +169,9 @@ class Automata:
         for state in states:
             if p_states := self.transitions.get((state, symbol)):
                 n_states.update(set(p_states))
+            for label, p_states in self.classes.get(state, ()):
+                if symbol in label:
+                    n_states.update(p_states)
         return list(n_states)
     
     def e_closure(self, states):
@@ -107,6 +188,24 @@ class Automata:
                 visited.update(p_states)
         return n_states
     
+    def alphabet(self) -> (List[Tuple[int, int]], List[str]):
+        """
+        Disjoint code point ranges that split every character and class label, and the labels that are not
+        characters.
+        """
+        bounds = set()
+        symbols = []
+        for symbol in self.vocabulary:
+            if isinstance(symbol, CharClass):
+                for low, high in symbol:
+                    bounds.update((low, high + 1))
+            elif len(symbol) == 1:
+                bounds.update((ord(symbol), ord(symbol) + 1))
+            else:
+                symbols.append(symbol)
+        bounds = sorted(bounds)
+        return list(zip(bounds, [bound - 1 for bound in bounds[1:]])), symbols
+    
     def dfa(self):
         transitions = {}
         
@@ -119,36 +218,48 @@ class Automata:
         start.info = Info(list(set(it.chain(*[self.states_info.get(s, Info([])).info for s in start]))))
         
         states = [start]
+        ids = {frozenset(start): start}
         pending = [start]
+        ranges, symbols = self.alphabet()
+        
+        def goto(state, symbol):
+            q = self.e_closure(self.move(state, symbol))
+            if not q:
+                return None
+            
+            key = frozenset(q)
+            if key not in ids:
+                q.id = len(states)
+                q.is_final = any(s in self.final_states for s in q)
+                q.tags = set()
+                for tags in (self.final_states.get(s) for s in q if s in self.final_states):
+                    q.tags.update(tags)
+                q.info = Info(list(set(it.chain(*[self.states_info.get(s, Info([])).info for s in q]))))
+                ids[key] = q
+                states.append(q)
+                pending.append(q)
+            return ids[key].id
         
         while pending:
             state = pending.pop()
-            for symbol in self.vocabulary:
-                q = self.e_closure(self.move(state, symbol))
-                if not q:
-                    continue
-                
-                if q not in states:
-                    q.id = len(states)
-                    q.is_final = any(s in self.final_states for s in q)
-                    q.tags = set()
-                    for tags in (self.final_states.get(s) for s in q if s in self.final_states):
-                        q.tags.update(tags)
-                    q.info = Info(list(set(it.chain(*[self.states_info.get(s, Info([])).info for s in q]))))
-                    states.append(q)
-                    pending.append(q)
-                else:
-                    for s in states:
-                        if q == s:
-                            q = s
-                
-                transitions[(state.id, symbol)] = (q.id,)
+            intervals = {}
+            for low, high in ranges:
+                if (target := goto(state, chr(low))) is not None:
+                    intervals.setdefault(target, []).append((low, high))
+            for target, target_intervals in intervals.items():
+                transitions[(state.id, CharClass(target_intervals))] = (target,)
+            for symbol in symbols:
+                if (target := goto(state, symbol)) is not None:
+                    transitions[(state.id, symbol)] = (target,)
         
         finals = {s.id: list(s.tags) for s in states if s.is_final}
         info = {s.id: s.info for s in states}
         
         return Automata(len(states), transitions, finals, start.id, info)
     
+    def lazy_dfa(self, max_states: int = 4096) -> "LazyAutomata":
+        return LazyAutomata(self, max_states)
+    
     def concat(self, other: "Automata"):
         l1 = self.states
         l2 = other.states
@@ -206,3 +317,63 @@ class Automata:
         finals.update({self.initial_state: list(all_tags)})
         
         return Automata(self.states, transitions, finals, self.initial_state, dict(self.states_info))
+
+
+class LazyAutomata:
+    """
+    DFA of an NFA whose states are only built the first time a transition reaches them. At most max_states are
+    kept, when there are more the cache is flushed and rebuilt from the current state.
+    """
+    
+    def __init__(self, nfa: Automata, max_states: int = 4096):
+        self.nfa = nfa
+        self.max_states = max_states
+        self.flush()
+        self.current = self.initial_state
+    
+    reset = Automata.reset
+    recognize = Automata.recognize
+    
+    def flush(self):
+        self.states: List[frozenset] = []
+        self.ids: Dict[frozenset, int] = {}
+        self.transitions: Dict[Tuple[int, str], int | None] = {}
+        self.final_states: Dict[int, List[Tuple[Any, int]]] = {}
+        self.types: Dict[int, Any] = {}
+        self.initial_state = self.state(frozenset(self.nfa.e_closure([self.nfa.initial_state])))
+    
+    def state(self, nfa_states: frozenset) -> int:
+        if nfa_states in self.ids:
+            return self.ids[nfa_states]
+        state = self.ids[nfa_states] = len(self.states)
+        self.states.append(nfa_states)
+        if any(s in self.nfa.final_states for s in nfa_states):
+            tags = set()
+            for s in nfa_states:
+                tags.update(self.nfa.final_states.get(s, []))
+            self.final_states[state] = list(tags)
+            self.types[state] = min(tags, key=lambda x: x[1])[0] if tags else None
+        return state
+    
+    def next(self, c: str):
+        current = self.step(self.current, c)
+        if current is not None:
+            self.current = current
+        return current is not None
+    
+    def step(self, state: int, c: str) -> int | None:
+        """
+        Target of the transition on c, building it if needed. A flush renumbers the states, so only the returned
+        one stays valid.
+        """
+        if (state, c) not in self.transitions:
+            nfa_states = frozenset(self.nfa.e_closure(self.nfa.move(self.states[state], c)))
+            if len(self.states) >= self.max_states:
+                current = self.states[state]
+                self.flush()
+                state = self.state(current)
+            self.transitions[(state, c)] = self.state(nfa_states) if nfa_states else None
+        return self.transitions[(state, c)]
+    
+    def get_type(self, state):
+        return self.types.get(state)
@@ -1,13 +1,18 @@
+import operator
+
 from .functions import Function
 from .scope import Scope
 
 
+def root_scope() -> Scope:
+    scope = Scope()
+    scope.declare('init', Function('init', [], None))
+    return scope
+
+
 class Type(type):
-    
-    def __new__(cls, *args, **kwargs):
-        cls.scope = Scope()
-        cls.scope.declare('init', Function('init', [], None))
-        return super(Type, cls).__new__(cls, *args, **kwargs)
+
+    scope = root_scope()
 
     def __add__(self, other):
         if issubclass(self, String) or issubclass(other, String):
@@ -238,16 +243,21 @@ class Boolean(Object, metaclass=TypeBool):
 
 
 class TypeList(Type):
+    # List types are interned, so structurally equal list types are the same object.
+    interned = {}
 
     def __new__(mcs, list_type):
+        if id(list_type) in mcs.interned:
+            return mcs.interned[id(list_type)]
         created = super().__new__(mcs, "List", (List,), {'list_type': list_type})
         created.list_type = list_type
         created.append = Function("append", [list_type], Null)
         created.remove = Function("remove", [list_type], Null)
+        mcs.interned[id(list_type)] = created
         return created
 
     def __getitem__(cls, item):
-        if not issubclass(item, Int):
+        if item is not Unknown and not issubclass(item, Int):
             raise TypeError("Index must be an integer")
         return cls.list_type
     
@@ -282,16 +292,22 @@ class List(Object):
 
 
 class TypeDict(Type):
+    # Dict types are interned, so structurally equal dict types are the same object.
+    interned = {}
 
     def __new__(mcs, types):
+        key = (id(types[0]), id(types[1]))
+        if key in mcs.interned:
+            return mcs.interned[key]
         created = super().__new__(mcs, "Dict", (Dict,), {'key_type': types[0], 'value_type': types[1]})
         created.key_type = types[0]
         created.value_type = types[1]
         created.keys = Function("keys", [], TypeList(created.key_type))
+        mcs.interned[key] = created
         return created
 
     def __getitem__(cls, item):
-        if not issubclass(item, cls.key_type) and not issubclass(cls.key_type, item):
+        if item is not Unknown and not issubclass(item, cls.key_type) and not issubclass(cls.key_type, item):
             raise TypeError(f"Index must be of type {cls.key_type}")
         return cls.value_type
 
@@ -322,3 +338,84 @@ class Null(metaclass=Type):
     
     def __eq__(self, other):
         return Boolean
+
+
+class TypeUnknown(Type):
+    """
+    Type given to expressions whose checking failed. Every operation on it is accepted and gives Unknown back,
+    so a single error is reported once instead of cascading.
+    """
+
+    def __add__(self, other):
+        return Unknown
+
+    __sub__ = __mul__ = __truediv__ = __mod__ = __eq__ = __ne__ = __lt__ = __gt__ = __le__ = __ge__ = __add__
+
+    def __neg__(self):
+        return Unknown
+
+    def __getitem__(cls, item):
+        return Unknown
+
+    def getattr(cls, name):
+        return Unknown
+
+
+class Unknown(Object, metaclass=TypeUnknown):
+    pass
+
+
+operators = {
+    '+': operator.add, '-': operator.sub, '*': operator.mul, '/': operator.truediv, '%': operator.mod,
+    '==': operator.eq, '!=': operator.ne, '<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge,
+    'neg': operator.neg
+}
+
+# Result type of every operator applied to a pair of types, or Unsupported when it raised TypeError, keyed by
+# operator and type identities. The operand types are stored along with the result to keep their identities alive.
+operator_results = {}
+
+
+class Unsupported:
+    """
+    Cached failure of an operator, holding the arguments of its TypeError. A new error is raised from them each
+    time, so tracebacks of unrelated lookups are not chained on a shared exception.
+    """
+    __slots__ = ('args',)
+
+    def __init__(self, args: tuple):
+        self.args = args
+
+
+def operate(symbol: str, *operands):
+    """
+    Result type of applying the operator to the operand types. Raises TypeError if the operator is not supported.
+    """
+    key = (symbol, *map(id, operands))
+    if key not in operator_results:
+        try:
+            result = Unknown if any(operand is Unknown for operand in operands) else operators[symbol](*operands)
+        except TypeError as e:
+            result = Unsupported(e.args)
+        operator_results[key] = (operands, result)
+    result = operator_results[key][1]
+    if isinstance(result, Unsupported):
+        raise TypeError(*result.args)
+    return result
+
+
+def precompute_operators(types):
+    for symbol in operators:
+        for left in types:
+            if symbol == 'neg':
+                operands = [(left,)]
+            else:
+                operands = [(left, right) for right in types]
+            for operand in operands:
+                try:
+                    operate(symbol, *operand)
+                except TypeError:
+                    pass
+
+
+precompute_operators([Object, Int, Float, String, Boolean, Null])
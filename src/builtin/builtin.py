@@ -1,76 +1,102 @@
+import hashlib
 import inspect
-import src
-import glob
+import os
+import pickle
 from pathlib import Path
 
-from src import *
 from builtin.functions import Function
 from builtin._types import Object, Null, Int, Float, Boolean, String, TypeList, TypeDict, Type, List
 from builtin.classes import Class
 from builtin.scope import Scope
+from tools import Singleton
 
 
-type_map = {type: Type, int: Int, float: Float, object: Object, bool: Boolean, str: String, None: Null}
+runtime_path = Path(__file__).parent.parent / 'src'
 
+# Bumped when the layout of the manifest changes, so that manifests cached by older versions are rebuilt
+manifest_version = 3
 
-def get_type(_type: str | type):
-    if isinstance(_type, str):
-        _type = eval(_type)
-    if isinstance(_type, list):
-        return TypeList(get_type(_type[0]))
-    if isinstance(_type, dict):
-        dict_types = list(_type.items())[0]
-        return TypeDict((get_type(dict_types[0]), get_type(dict_types[1])))
-    return type_map.get(_type, _type)
+# Runtime functions without arguments that always return the same number. Their values are stored in the manifest,
+# so the optimiser folds their calls to what the runtime returns.
+constant_functions = ['golden']
 
+type_names = {type: 'Type', int: 'Int', float: 'Float', object: 'Object', bool: 'Boolean', str: 'String', None: 'Null'}
 
-def get_classes_in_module(module) -> [type]:
-    classes = inspect.getmembers(module, inspect.isclass)
-    result = []
-    for _class in classes:
-        result.append(_class)
-    return result
+primitive_types = {'Type': Type, 'Int': Int, 'Float': Float, 'Object': Object, 'Boolean': Boolean, 'String': String,
+                   'Null': Null}
 
 
-def get_classes(module=src) -> [Class]:
-    classes = get_classes_in_module(module)
-    created = set()
-    result = []
-    while len(created) != len(classes):
-        for _class in classes:
-            if _class[1] not in created and (_class[1].__base__ == object or _class[1].__base__ in created):
-                super_class = _class[1].__base__ if _class[1].__base__ != object else None
-                scope = Scope()
-                c_class = Class(_class[0], type_map[super_class] if super_class else None, scope)
-                c_class.super_class = super_class
-                type_map[_class[1]] = c_class
-                result.append(c_class)
-                created.add(_class[1])
-    for _class in classes:
-        c_class = type_map[_class[1]]
-        for function in inspect.getmembers(_class[1], inspect.isfunction):
-            function_name = function[0] if function[0] != "__init__" else "init"
-            c_class.scope.declare(function_name, get_builtin_function(function))
-        if not c_class.scope.father and not c_class.scope.get('init', safe=True):
-            c_class.scope.declare('init', Function('init', [], None))
-        for var in _class[1].__annotations__:
-            _type = get_type(_class[1].__annotations__[var])
-            c_class.scope.declare(var, _type)
-    return result
+def describe_type(_type: str | type, namespace: dict) -> str | tuple:
+    """
+    Serialisable description of a runtime annotation: a type name, ('List', item) or ('Dict', key, value).
+    """
+    if isinstance(_type, str):
+        _type = eval(_type, namespace)
+    if isinstance(_type, list):
+        return 'List', describe_type(_type[0], namespace)
+    if isinstance(_type, dict):
+        dict_types = list(_type.items())[0]
+        return 'Dict', describe_type(dict_types[0], namespace), describe_type(dict_types[1], namespace)
+    if _type in type_names:
+        return type_names[_type]
+    return _type.__name__
 
 
-def get_builtin_function(function) -> Function:
+def describe_function(function, namespace: dict) -> tuple:
     _annotations = inspect.get_annotations(function[1])
-    params = [get_type(_annotations[var]) for var in _annotations if var != 'return']
-    return Function(function[0], params, get_type(_annotations.get('return', None)))
-
-
-def get_functions(module=src) -> [Function]:
-    functions = inspect.getmembers(module, inspect.isfunction)
-    result = []
-    for function in functions:
-        result.append(get_builtin_function(function))
-    return result
+    params = [describe_type(_annotations[var], namespace) for var in _annotations if var != 'return']
+    return function[0], params, describe_type(_annotations.get('return', None), namespace)
+
+
+def build_manifest(module) -> dict:
+    """
+    Reflects the runtime module into a manifest of class and function signatures.
+    """
+    namespace = vars(module)
+    classes = {}
+    for name, _class in inspect.getmembers(module, inspect.isclass):
+        base = _class.__base__.__name__ if _class.__base__ != object else None
+        methods = [describe_function(function, namespace)
+                   for function in inspect.getmembers(_class, inspect.isfunction)]
+        attributes = [(var, describe_type(_type, namespace)) for var, _type in _class.__annotations__.items()]
+        classes[name] = (base, methods, attributes)
+    functions = [describe_function(function, namespace) for function in inspect.getmembers(module, inspect.isfunction)]
+    # Names defined in the body of every class and its bases, which instance attributes of subclasses can't take as
+    # slots
+    members = {name: sorted({member for base in _class.__mro__[:-1] for member in vars(base)})
+               for name, _class in inspect.getmembers(module, inspect.isclass)}
+    constants = {name: getattr(module, name)() for name in constant_functions if hasattr(module, name)}
+    return {'classes': classes, 'functions': functions, 'members': members, 'constants': constants}
+
+
+def runtime_hash() -> str:
+    digest = hashlib.sha256()
+    digest.update(str(manifest_version).encode())
+    for file in sorted(runtime_path.glob('*.py')):
+        digest.update(file.name.encode())
+        digest.update(file.read_bytes())
+    return digest.hexdigest()
+
+
+def load_manifest(path=None) -> dict:
+    """
+    Loads the runtime manifest from path, rebuilding it when the runtime sources changed.
+    """
+    digest = runtime_hash()
+    if path:
+        try:
+            if open(f'{path}/manifest.hash', 'r').read() == digest:
+                return pickle.load(open(f'{path}/manifest.pkl', 'rb'))
+        except FileNotFoundError:
+            pass
+    import src
+    manifest = build_manifest(src)
+    if path:
+        os.makedirs(path, exist_ok=True)
+        pickle.dump(manifest, open(f'{path}/manifest.pkl', 'wb'))
+        with open(f'{path}/manifest.hash', 'w') as f:
+            f.write(digest)
+    return manifest
 
 
 def get_code(files_path) -> [str]:
@@ -81,14 +107,67 @@ def get_code(files_path) -> [str]:
     return result
 
 
-builtin_classes: [Class] = [*get_classes()]
-
-builtin_functions: [Function] = [
-    Function("print", [Object], Null),
-    Function("len", [List], Int),
-    Function("isinstance", [Object, Type], Boolean),
-    Function("max", [Float, Float], Float),
-    Function("min", [Float, Float], Float),
-    Function("pow", [Float, Float], Float),
-    *get_functions()
-]
+class Builtins(metaclass=Singleton):
+    """
+    Builtin functions and runtime classes. Classes are only created the first time they are looked up.
+    """
+
+    def __init__(self, path=None):
+        manifest = load_manifest(path)
+        self.class_signatures: {str: tuple} = manifest['classes']
+        self.class_members: {str: [str]} = manifest['members']
+        self.constants: {str: float} = manifest['constants']
+        self.function_signatures: {str: tuple} = {function[0]: function for function in manifest['functions']}
+        self.classes: {str: Class} = {}
+        self.functions: {str: Function} = {function.name: function for function in [
+            Function("print", [Object], Null),
+            Function("len", [List], Int),
+            Function("isinstance", [Object, Type], Boolean),
+            Function("max", [Float, Float], Float),
+            Function("min", [Float, Float], Float),
+            Function("pow", [Float, Float], Float),
+        ]}
+
+    def names(self) -> [str]:
+        return [*self.functions, *self.function_signatures, *self.class_signatures]
+
+    def members(self, name: str) -> {str}:
+        return set(self.class_members.get(name, []))
+
+    def get(self, name: str) -> Function:
+        if name in self.class_signatures:
+            return self.get_class(name).get_constructor()
+        if name not in self.functions:
+            self.functions[name] = self.get_function(self.function_signatures[name])
+        return self.functions[name]
+
+    def get_class(self, name: str) -> Class | None:
+        if name in self.classes:
+            return self.classes[name]
+        if name not in self.class_signatures:
+            return None
+        base, methods, attributes = self.class_signatures[name]
+        c_class = Class(name, self.get_class(base) if base else None, Scope())
+        self.classes[name] = c_class
+        for method in methods:
+            function = self.get_function(method)
+            c_class.scope.declare(function.name if function.name != "__init__" else "init", function)
+        if not c_class.scope.father and not c_class.scope.get('init', safe=True):
+            c_class.scope.declare('init', Function('init', [], None))
+        for var, _type in attributes:
+            c_class.scope.declare(var, self.get_type(_type))
+        c_class.scope.flatten()
+        return c_class
+
+    def get_function(self, signature: tuple) -> Function:
+        name, params, return_type = signature
+        return Function(name, [self.get_type(param) for param in params], self.get_type(return_type))
+
+    def get_type(self, description: str | tuple):
+        if isinstance(description, tuple):
+            if description[0] == 'List':
+                return TypeList(self.get_type(description[1]))
+            return TypeDict((self.get_type(description[1]), self.get_type(description[2])))
+        if description in primitive_types:
+            return primitive_types[description]
+        return self.get_class(description)
@@ -30,7 +30,7 @@ class Class(Type):
         return Boolean if isinstance(other, Class) else other.__eq__(other, self)
 
     def getattr(self, item):
-        try:
-            return self.scope.get(item)
-        except:
+        scope = self.scope.find(item)
+        if not scope:
             raise AttributeError(f"{self.name} type has no property or method {item}")
+        return scope.variables[item]
@@ -0,0 +1,98 @@
+from bisect import bisect_left
+
+from ._types import Type, Object, TypeList, TypeDict
+
+
+class TypeRegistry:
+    """
+    Types declared by name, and the class hierarchy of every type seen so far. Classes are numbered with their pre
+    and post order in the hierarchy, so a subtype test is two comparisons and the closest common supertype is a
+    binary search over the ancestors. Types are keyed by id, since they are not hashable.
+    """
+
+    def __init__(self, types: [Type]):
+        self.names: {str: Type} = {}
+        self.classes: {int: Type} = {}
+        self.order: {int: (int, int)} = {}
+        self.ancestors: {int: [Type]} = {}
+        for _type in types:
+            self.declare(_type)
+
+    def declare(self, _type: Type) -> None:
+        """
+        Gives the type its name. A name that is already declared keeps its first type.
+        """
+        self.names.setdefault(str(_type), _type)
+        self.add(_type)
+
+    def get(self, name: str) -> Type | None:
+        return self.names.get(name)
+
+    def add(self, _type: Type) -> None:
+        while _type is not object and id(_type) not in self.classes:
+            self.classes[id(_type)] = _type
+            self.order = {}
+            _type = _type.__base__
+
+    def number(self) -> None:
+        children = {key: [] for key in self.classes}
+        roots = []
+        for _type in self.classes.values():
+            if _type.__base__ is object:
+                roots.append(_type)
+            else:
+                children[id(_type.__base__)].append(_type)
+        counter = 0
+        pre = {}
+        stack = [(root, False) for root in reversed(roots)]
+        while stack:
+            _type, visited = stack.pop()
+            if visited:
+                self.order[id(_type)] = (pre[id(_type)], counter)
+            else:
+                pre[id(_type)] = counter
+                stack.append((_type, True))
+                stack.extend((child, False) for child in reversed(children[id(_type)]))
+            counter += 1
+
+    def interval(self, _type: Type) -> (int, int):
+        if id(_type) not in self.classes:
+            self.add(_type)
+        if not self.order:
+            self.number()
+        return self.order[id(_type)]
+
+    def is_subtype(self, type1, type2) -> bool:
+        """
+        Same as issubclass(type1, type2). Generic list and dict types have no subclasses, so they are not numbered.
+        """
+        if type1 is type2:
+            return True
+        if not isinstance(type1, Type) or not isinstance(type2, Type):
+            return issubclass(type1, type2)
+        if isinstance(type2, TypeList | TypeDict):
+            return False
+        if isinstance(type1, TypeList | TypeDict):
+            type1 = type1.__base__
+        pre1, post1 = self.interval(type1)
+        pre2, post2 = self.interval(type2)
+        return pre2 <= pre1 and post1 <= post2
+
+    def common_supertype(self, type1: Type, type2: Type) -> Type:
+        """
+        Closest ancestor of type1 that type2 is a subtype of, or Object if there is none.
+        """
+        if not isinstance(type1, TypeList | TypeDict):
+            self.add(type1)
+        if id(type1) not in self.ancestors:
+            chain = []
+            _type = type1
+            while _type is not object:
+                chain.append(_type)
+                if _type is Object:
+                    break
+                _type = _type.__base__
+            self.ancestors[id(type1)] = chain
+        chain = self.ancestors[id(type1)]
+        k = bisect_left(range(len(chain)), True, key=lambda i: self.is_subtype(type2, chain[i]))
+        return chain[k] if k < len(chain) else Object
@@ -2,36 +2,100 @@ from __future__ import annotations
 
 
 class Scope:
+    # Bumped whenever a frozen scope changes, so that every resolution cache built on top of it is dropped.
+    generation = 0
+
     def __init__(self, father: Scope | None = None):
         self.variables: {str: object} = {}
         self.father = father
+        self.cache: {str: Scope} = {}
+        self.generation = Scope.generation
+        self.frozen = False
 
     def declare(self, name: str, value: object) -> None:
-        if name not in self.variables:
+        if name not in self.variables and not self.load(name):
             self.variables[name] = value
+            self.changed()
         else:
             raise Exception(f"Variable {name} already exists")
 
+    def remove(self, name: str) -> None:
+        del self.variables[name]
+        self.cache.pop(name, None)
+        self.changed()
+
     def get(self, name: str, *, safe=False):
-        if name in self.variables:
-            return self.variables[name]
-        if self.father:
-            return self.father.get(name, safe=safe)
+        scope = self.find(name)
+        if scope:
+            return scope.variables[name]
         if not safe:
             raise Exception(f"Variable {name} not defined")
         return False
 
     def assign(self, name: str, value: object):
-        if name in self.variables:
-            self.variables[name] = value
-        elif self.father:
-            self.father.assign(name, value)
-        else:
+        scope = self.find(name)
+        if not scope:
             raise Exception(f"Variable {name} not defined")
+        scope.variables[name] = value
 
     def exists(self, name: str):
+        return self.find(name) is not None
+
+    def find(self, name: str) -> Scope | None:
+        """
+        Returns the scope in the chain that declares name, walking the chain iteratively and caching the result.
+        """
         if name in self.variables:
-            return True
-        if self.father:
-            return self.father.exists(name)
+            return self
+        if self.generation != Scope.generation:
+            self.cache = {}
+            self.generation = Scope.generation
+        if name in self.cache:
+            return self.cache[name]
+        scope = self
+        while name not in scope.variables:
+            if scope.father is None:
+                if not scope.load(name):
+                    return None
+                break
+            scope = scope.father
+        self.cache[name] = scope
+        return scope
+
+    def flatten(self) -> None:
+        """
+        Resolves every name visible from this scope at once and freezes the chain, so later changes to any scope
+        in it invalidate the resolution caches.
+        """
+        chain = []
+        scope = self
+        while scope is not None:
+            scope.frozen = True
+            chain.append(scope)
+            scope = scope.father
+        self.generation = Scope.generation
+        self.cache = {name: scope for scope in reversed(chain) for name in scope.variables}
+
+    def load(self, name: str) -> bool:
         return False
+
+    def changed(self) -> None:
+        if self.frozen:
+            Scope.generation += 1
+
+
+class LazyScope(Scope):
+    """
+    Scope whose lazy names are only resolved, through resolve, the first time they are used.
+    """
+    def __init__(self, resolve, names: [str], father: Scope | None = None):
+        super().__init__(father)
+        self.resolve = resolve
+        self.lazy_names: {str} = set(names)
+
+    def load(self, name: str) -> bool:
+        if name not in self.lazy_names:
+            return False
+        self.lazy_names.discard(name)
+        self.variables[name] = self.resolve(name)
+        return True
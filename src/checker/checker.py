@@ -1,57 +1,100 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
 from tools import Singleton, visitor
-from builtin.scope import Scope
+from builtin.scope import Scope, LazyScope
 from _parser.nodes import *
 from tokenizer.token_type import TokenType
-from builtin._types import Float, Int, String, Boolean, Null, TypeList, Object, TypeDict, Type
+from builtin._types import Float, Int, String, Boolean, Null, TypeList, Object, TypeDict, Type, Unknown, operate
 from builtin.functions import Function
-from builtin.builtin import builtin_functions, builtin_classes
+from builtin.builtin import Builtins
 from builtin.classes import Class
-from errors import Error
+from builtin.registry import TypeRegistry
+from errors import Error, CheckingError, Diagnostic
+
+
+@dataclass(slots=True)
+class Context:
+    """
+    State of a check: the scope names are looked up in, the function, class and loops the checked code is in, and
+    the types recorded for the transpiler. Every check has its own, so declarations can be checked apart.
+    """
+    scope: Scope
+    current_function: Function | None = None
+    current_class: Class | None = None
+    current_loops: int = 0
+    types: {int: Type} = field(default_factory=dict)
 
 
 class TypeChecker(metaclass=Singleton):
 
+    operators = {
+        TokenType.EQUAL_EQUAL: '==', TokenType.EQUAL_DIFFERENT: '!=', TokenType.PLUS: '+', TokenType.MINUS: '-',
+        TokenType.DIVIDE: '/', TokenType.MULTIPLY: '*', TokenType.LESS: '<', TokenType.LESS_EQUAL: '<=',
+        TokenType.GREATER: '>', TokenType.GREATER_EQUAL: '>=', TokenType.MODULO: '%'
+    }
+
     def __init__(self, error: Error):
         self.error = error
-        self.globals = Scope()
-        self.scope = self.globals
-        self.types = [Object, Float, Int, String, Boolean, *builtin_classes]
-        self.current_function: Function | None = None
-        self.current_class: Class | None = None
-        self.current_loops = 0
-        for fun in builtin_functions:
-            self.scope.declare(fun.name, Function(fun.name, fun.param_types, fun.return_type))
-        for cls in builtin_classes:
-            self.scope.declare(cls.name, cls.get_constructor())
-
-    def start(self, expressions: [Node]):
+        self.builtins = Builtins()
+        self.globals = LazyScope(self.builtins.get, self.builtins.names())
+        self.registry = TypeRegistry([Object, Float, Int, String, Boolean])
+        # Types of the operators and their operands, keyed by node id, that the transpiler specialises on. They are
+        # recorded in the context of each check and gathered here.
+        self.types: {int: Type} = {}
+
+    def start(self, expressions: [Node], workers: int = 1):
         self.check_classes_in_scope(expressions)
-        self.check_functions_in_scope(self.scope, expressions)
-        if "main" not in self.scope.variables:
+        self.check_functions_in_scope(self.globals, expressions)
+        try:
+            self.check_main()
+        except CheckingError:
+            pass
+        if workers > 1 and len(expressions) > 1 and 'fork' in multiprocessing.get_all_start_methods():
+            self.parallel_check(expressions, workers)
+        else:
+            context = Context(self.globals)
+            self.check_block(expressions, self.globals, context)
+            self.types.update(context.types)
+
+    def parallel_check(self, expressions: [Node], workers: int):
+        """
+        Checks the top level classes and functions in forked processes, which inherit the collected signatures.
+        Their diagnostics are added in declaration order, as the sequential check would find them.
+        """
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('fork'), initializer=init_worker,
+                                 initargs=(self, expressions)) as pool:
+            results = list(pool.map(check_declaration, range(len(expressions)),
+                                    chunksize=max(1, len(expressions) // (workers * 4))))
+        for diagnostics, types in results:
+            for diagnostic in diagnostics:
+                self.error.add(diagnostic)
+            self.types.update((key, self.registry.get(name) or Null) for key, name in types.items())
+
+    def check_main(self):
+        if "main" not in self.globals.variables:
             self.error("Program must contain a main method")
-        main: Function = self.scope.get("main")
-        if len(main.param_types) != 0 or not issubclass(main.return_type, Null):
+        main: Function = self.globals.get("main")
+        if len(main.param_types) != 0 or not self.registry.is_subtype(main.return_type, Null):
             self.error("Main method must receive no arguments and return void", line=main.line)
-        for expression in expressions:
-            expression.check(self)
-        return
 
     @visitor(Statement)
-    def check(self, expression: Statement):
-        return expression.code.check(self)
+    def check(self, expression: Statement, context: Context):
+        return expression.code.check(self, context)
 
     @visitor(ContinueNode)
-    def check(self, expression: ContinueNode):
-        if self.current_loops <= 0:
+    def check(self, expression: ContinueNode, context: Context):
+        if context.current_loops <= 0:
             self.error("continue must be inside a for or while loop body", token=expression.token)
 
     @visitor(BreakNode)
-    def check(self, expression: BreakNode):
-        if self.current_loops <= 0:
+    def check(self, expression: BreakNode, context: Context):
+        if context.current_loops <= 0:
             self.error("break must be inside a for or while loop body", token=expression.token)
 
     @visitor(Literal)
-    def check(self, expression: Literal):
+    def check(self, expression: Literal, context: Context):
         if isinstance(expression.value, bool):
             return Boolean
         if isinstance(expression.value, float):
@@ -65,154 +108,158 @@ class TypeChecker(metaclass=Singleton):
         return None
 
     @visitor(ForNode)
-    def check(self, expression: ForNode):
-        scope = Scope(self.scope)
-        iterable = expression.iterable.check(self)
+    def check(self, expression: ForNode, context: Context):
+        scope = Scope(context.scope)
+        iterable = self.recover(expression.iterable, context)
         if isinstance(iterable, TypeDict):
             scope.declare(expression.variable.text, iterable.key_type)
         elif isinstance(iterable, TypeList):
             scope.declare(expression.variable.text, iterable.list_type)
         else:
-            self.error("For can only iterate over a list or a dictionary", line=expression.start.line)
-        self.current_loops += 1
-        self.check_block(expression.statements, scope)
-        self.current_loops -= 1
+            scope.declare(expression.variable.text, Unknown)
+            if iterable is not Unknown:
+                try:
+                    self.error("For can only iterate over a list or a dictionary", line=expression.start.line)
+                except CheckingError:
+                    pass
+        context.current_loops += 1
+        self.check_block(expression.statements, scope, context)
+        context.current_loops -= 1
 
     @visitor(ArrayNode)
-    def check(self, expression: ArrayNode):
-        result = [elem.check(self) for elem in expression.expressions]
+    def check(self, expression: ArrayNode, context: Context):
+        result = [elem.check(self, context) for elem in expression.expressions]
         list_type = self.common_type(result)
         return TypeList(list_type)
 
     @visitor(DictionaryNode)
-    def check(self, expression: DictionaryNode):
-        keys = [elem.check(self) for elem in expression.keys]
-        values = [elem.check(self) for elem in expression.values]
+    def check(self, expression: DictionaryNode, context: Context):
+        keys = [elem.check(self, context) for elem in expression.keys]
+        values = [elem.check(self, context) for elem in expression.values]
         keys_types = self.common_type(keys)
         values_types = self.common_type(values)
-        if keys_types is None or values_types is None:
+        if keys_types is None or values_types is None or keys_types is Unknown:
             return TypeDict((keys_types, values_types))
-        if issubclass(Object, keys_types):
+        if self.registry.is_subtype(Object, keys_types):
             self.error("Dictionary keys are not of the same type", line=expression.start.line)
-        if not issubclass(keys_types, Float) and not issubclass(keys_types, String):
+        if not self.registry.is_subtype(keys_types, Float) and not self.registry.is_subtype(keys_types, String):
             self.error("Dictionary keys are not immutable", line=expression.start.line)
         return TypeDict((keys_types, values_types))
 
     @visitor(Index)
-    def check(self, expression: Index):
-        left = expression.expression.check(self)
-        index = expression.index.check(self)
-        return left[index]
+    def check(self, expression: Index, context: Context):
+        left = expression.expression.check(self, context)
+        index = expression.index.check(self, context)
+        try:
+            return left[index]
+        except TypeError as e:
+            self.error(e.args[0], token=leading_token(expression))
 
     @visitor(Grouping)
-    def check(self, expression: Grouping):
-        return expression.expression.check(self)
+    def check(self, expression: Grouping, context: Context):
+        return expression.expression.check(self, context)
 
     @visitor(Unary)
-    def check(self, expression: Unary):
-        right = expression.right.check(self)
+    def check(self, expression: Unary, context: Context):
+        right = expression.right.check(self, context)
         if expression.operator.type == TokenType.MINUS:
-            return -right
+            try:
+                return operate('neg', right)
+            except TypeError as e:
+                self.error(e.args[0], token=expression.operator)
         elif expression.operator.type == TokenType.EXCLAMATION:
-            if not issubclass(right, Boolean):
+            if not self.is_boolean(right):
                 self.error(f"Operator ! not supported for {right}", token=expression.operator)
             return Boolean
         return None
 
     @visitor(Binary)
-    def check(self, expression: Binary):
-        left = expression.left.check(self)
-        right = expression.right.check(self)
+    def check(self, expression: Binary, context: Context):
+        left = expression.left.check(self, context)
+        right = expression.right.check(self, context)
+        if expression.operator.type in [TokenType.AND, TokenType.OR]:
+            if not self.is_boolean(left) or not self.is_boolean(right):
+                self.error(f"Operator not supported for types {left} and {right}", token=expression.operator)
+            return Boolean
+        if expression.operator.type not in self.operators:
+            return None
         try:
-            if expression.operator.type == TokenType.EQUAL_EQUAL:
-                return left == right
-            if expression.operator.type == TokenType.EQUAL_DIFFERENT:
-                return left != right
-            if expression.operator.type in [TokenType.AND, TokenType.OR]:
-                if not issubclass(left, Boolean) or not issubclass(right, Boolean):
-                    self.error(f"Operator not supported for types {left} and {right}", token=expression.operator)
-                return Boolean
-            if expression.operator.type == TokenType.PLUS:
-                return left + right
-            if expression.operator.type == TokenType.MINUS:
-                return left - right
-            if expression.operator.type == TokenType.DIVIDE:
-                return left / right
-            if expression.operator.type == TokenType.MULTIPLY:
-                return left * right
-            if expression.operator.type == TokenType.LESS:
-                return left < right
-            if expression.operator.type == TokenType.LESS_EQUAL:
-                return left <= right
-            if expression.operator.type == TokenType.GREATER:
-                return left > right
-            if expression.operator.type == TokenType.GREATER_EQUAL:
-                return left >= right
-            if expression.operator.type == TokenType.MODULO:
-                return left % right
+            result = operate(self.operators[expression.operator.type], left, right)
         except TypeError as e:
             self.error(e.args[0], token=expression.operator)
-        return None
+        context.types[id(expression)] = result
+        context.types[id(expression.left)] = left
+        context.types[id(expression.right)] = right
+        return result
 
     @visitor(Variable)
-    def check(self, expression: Variable):
-        try:
-            return self.check_scope(expression.name.text)
-        except:
+    def check(self, expression: Variable, context: Context):
+        scope = self.find_scope(expression.name.text, context)
+        if not scope:
             self.error(f"{expression.name.text} not defined in current scope", token=expression.name)
+        return scope.variables[expression.name.text]
 
     @visitor(VarDeclaration)
-    def check(self, expression: VarDeclaration):
-        expression_type = expression.expression.check(self)
-        if expression.type:
-            variable_type = expression.type.check(self)
-            if not self.can_assign(expression_type, variable_type):
-                self.error(
-                    f"Variable {expression.name.text} of type {variable_type} can't be assigned {expression_type}",
-                    line=expression.name.line)
-            expression_type = variable_type
-        else:
-            if isinstance(expression_type, Function):
-                self.error(
-                    f"Variable {expression.name.text} can't be assigned {expression_type}", line=expression.name.line)
-            if not self.can_infer(expression_type):
-                self.error("Can't infer type from expression", line=expression.name.line)
-        if self.scope.exists(expression.name.text):
-            self.error(f"Variable {expression.name.text} already exists", line=expression.name.line)
-        self.scope.declare(expression.name.text, expression_type)
+    def check(self, expression: VarDeclaration, context: Context):
+        try:
+            expression_type = expression.expression.check(self, context)
+            if expression.type:
+                variable_type = expression.type.check(self, context)
+                if not self.can_assign(expression_type, variable_type):
+                    self.error(
+                        f"Variable {expression.name.text} of type {variable_type} can't be assigned {expression_type}",
+                        line=expression.name.line)
+                expression_type = variable_type
+            else:
+                if isinstance(expression_type, Function):
+                    self.error(f"Variable {expression.name.text} can't be assigned {expression_type}",
+                               line=expression.name.line)
+                if not self.can_infer(expression_type):
+                    self.error("Can't infer type from expression", line=expression.name.line)
+            if context.scope.exists(expression.name.text):
+                self.error(f"Variable {expression.name.text} already exists", line=expression.name.line)
+        except CheckingError:
+            # The variable is still declared, so that its uses don't report errors again.
+            if context.scope.exists(expression.name.text):
+                raise
+            expression_type = Unknown
+        context.scope.declare(expression.name.text, expression_type)
 
     @visitor(VarType)
-    def check(self, expression: VarType):
+    def check(self, expression: VarType, context: Context):
         if expression.type.text == "List":
-            return TypeList(expression.nested.check(self))
+            return TypeList(expression.nested.check(self, context))
         if expression.type.text == "Dict":
-            return TypeDict((expression.nested.check(self), expression.s_nested.check(self)))
-        for t in self.types:
-            if expression.type.text == str(t):
-                return t
+            return TypeDict((expression.nested.check(self, context), expression.s_nested.check(self, context)))
+        if t := self.find_type(expression.type.text):
+            return t
         self.error(f"Type {expression.type.text} is not defined in current scope", token=expression.type)
 
     @visitor(Assignment)
-    def check(self, expression: Assignment):
-        expression_type = expression.value.check(self)
-        left_type = expression.left.check(self)
+    def check(self, expression: Assignment, context: Context):
+        expression_type = expression.value.check(self, context)
+        left_type = expression.left.check(self, context)
         if not self.can_assign(expression_type, left_type):
             self.error(
                 f"Can't assign {expression_type} to {left_type} object", line=expression.line)
 
     @visitor(ExpressionStatement)
-    def check(self, expression: ExpressionStatement):
-        return expression.expression.check(self)
+    def check(self, expression: ExpressionStatement, context: Context):
+        return expression.expression.check(self, context)
 
     @visitor(Call)
-    def check(self, expression: Call):
-        called: Function = expression.called.check(self)
+    def check(self, expression: Call, context: Context):
+        called: Function = expression.called.check(self, context)
+        if called is Unknown:
+            for arg in expression.arguments:
+                arg.check(self, context)
+            return Unknown
         if not isinstance(called, Function):
             self.error(f"Calls must be made to functions and methods", line=expression.line)
         if len(expression.arguments) != len(called.param_types):
             self.error("Invalid number of arguments", line=expression.line)
         for arg, param in zip(expression.arguments, called.param_types):
-            arg_type = arg.check(self)
+            arg_type = arg.check(self, context)
             if param is Type and isinstance(arg_type, Function):
                 continue
             if not self.can_assign(arg_type, param):
@@ -220,61 +267,67 @@ class TypeChecker(metaclass=Singleton):
         return called.return_type
 
     @visitor(FunctionNode)
-    def check(self, expression: FunctionNode):
-        if self.current_class and expression.name.text == "init":
-            if not issubclass(Object, self.current_class.__bases__[0]):
-                line = None
-                for statement in expression.body:
-                    if not isinstance(statement.code, CommentNode):
-                        line = statement.code
-                        break
-                if not expression.body or not isinstance(line, Call):
-                    self.error("init method must call super's init in first statement", line=expression.name.line)
-                if not isinstance(line.called, GetNode):
-                    self.error("init method must call super's init in first statement", line=expression.name.line)
-                if not isinstance(line.called.left, SuperNode) or line.called.right.text != "init":
-                    self.error("init method must call super's init in first statement", line=expression.name.line)
+    def check(self, expression: FunctionNode, context: Context):
+        if context.current_class and expression.name.text == "init":
+            try:
+                self.check_super_init(expression, context)
+            except CheckingError:
+                pass
         scope = Scope(self.globals)
         for param in expression.params:
-            scope.declare(param[0].text, param[1].check(self))
-        self.current_function = self.check_scope(expression.name.text)
-        self.check_block(expression.body, scope)
-        if not issubclass(self.current_function.return_type, Null) and not self.check_return_paths(expression.body):
+            scope.declare(param[0].text, self.recover(param[1], context))
+        context.current_function = self.check_scope(expression.name.text, context)
+        self.check_block(expression.body, scope, context)
+        function, context.current_function = context.current_function, None
+        if not self.registry.is_subtype(function.return_type, Null) and not self.check_return_paths(expression.body):
             self.error("All code paths don't return a value", line=expression.name.line)
-        self.current_function = None
+
+    def check_super_init(self, expression: FunctionNode, context: Context):
+        if not self.registry.is_subtype(Object, context.current_class.__bases__[0]):
+            line = None
+            for statement in expression.body:
+                if not isinstance(statement.code, CommentNode):
+                    line = statement.code
+                    break
+            if not expression.body or not isinstance(line, Call):
+                self.error("init method must call super's init in first statement", line=expression.name.line)
+            if not isinstance(line.called, GetNode):
+                self.error("init method must call super's init in first statement", line=expression.name.line)
+            if not isinstance(line.called.left, SuperNode) or line.called.right.text != "init":
+                self.error("init method must call super's init in first statement", line=expression.name.line)
 
     @visitor(Return)
-    def check(self, expression: Return):
-        if not self.current_function:
+    def check(self, expression: Return, context: Context):
+        if not context.current_function:
             self.error("return statement should be inside a function", token=expression.start)
         if expression.expression:
-            return_type = expression.expression.check(self)
+            return_type = expression.expression.check(self, context)
         else:
             return_type = Null
-        expected = self.current_function.return_type
+        expected = context.current_function.return_type
         if not self.can_assign(return_type, expected):
             self.error(
                 f"Function expects {expected} return type, got {return_type} instead", line=expression.start.line)
 
     @visitor(If)
-    def check(self, expression: If):
-        if not issubclass(expression.condition.check(self), Boolean):
-            self.error(f"if condition is not a boolean value", line=expression.start.line)
-        self.check_block(expression.code, Scope(self.scope))
-        self.check_block(expression.else_code, Scope(self.scope))
+    def check(self, expression: If, context: Context):
+        self.check_condition(expression.condition, "if condition is not a boolean value", expression.start.line,
+                             context)
+        self.check_block(expression.code, Scope(context.scope), context)
+        self.check_block(expression.else_code, Scope(context.scope), context)
 
     @visitor(While)
-    def check(self, expression: While):
-        if not issubclass(expression.condition.check(self), Boolean):
-            self.error(f"while condition is not a boolean value", line=expression.start.line)
-        self.current_loops += 1
-        self.check_block(expression.code, Scope(self.scope))
-        self.current_loops -= 1
+    def check(self, expression: While, context: Context):
+        self.check_condition(expression.condition, "while condition is not a boolean value",
+                             expression.start.line, context)
+        context.current_loops += 1
+        self.check_block(expression.code, Scope(context.scope), context)
+        context.current_loops -= 1
 
     @visitor(ClassNode)
-    def check(self, expression: ClassNode):
+    def check(self, expression: ClassNode, context: Context):
         created = self.get_class(expression.name)
-        self.current_class = created
+        context.current_class = created
         expression.methods.sort(key=lambda x: {"init": 0}.get(x.name.text, 1))
         attributes = []
         for attr_name, attr_type in created.scope.variables.items():
@@ -282,78 +335,114 @@ class TypeChecker(metaclass=Singleton):
                 continue
             attributes.append(attr_name)
         for attribute in attributes:
-            del created.scope.variables[attribute]
-        self.check_block(expression.methods, created.scope)
-        self.current_class = None
+            created.scope.remove(attribute)
+        self.check_block(expression.methods, created.scope, context)
+        context.current_class = None
 
     @visitor(SelfNode)
-    def check(self, expression: SelfNode):
-        if not self.current_class:
+    def check(self, expression: SelfNode, context: Context):
+        if not context.current_class:
             self.error("self must be contained in a class", token=expression.token)
-        return self.current_class
+        return context.current_class
 
     @visitor(SuperNode)
-    def check(self, expression: SuperNode):
-        if not self.current_class:
+    def check(self, expression: SuperNode, context: Context):
+        if not context.current_class:
             self.error("super must be contained in a class", token=expression.token)
-        return self.current_class.__bases__[0]
+        return context.current_class.__bases__[0]
 
     @visitor(GetNode)
-    def check(self, expression: GetNode):
-        left: Class = expression.left.check(self)
+    def check(self, expression: GetNode, context: Context):
+        left: Class = expression.left.check(self, context)
         try:
             return left.getattr(expression.right.text)
         except AttributeError as e:
             self.error(e.args[0], line=expression.right.line)
 
     @visitor(AttrDeclaration)
-    def check(self, expression: AttrDeclaration):
-        if not self.current_class:
+    def check(self, expression: AttrDeclaration, context: Context):
+        if not context.current_class:
             self.error("Attributes can only be created inside classes", line=expression.name.line)
-        if self.current_function.name != "init":
+        if context.current_function.name != "init":
             self.error("Attributes can only be declared in init class method", line=expression.name.line)
-        expression_type = expression.expression.check(self)
-        if expression.type:
-            attr_type = expression.type.check(self)
-            if not self.can_assign(expression_type, attr_type):
-                self.error(
-                    f"Attribute {expression.name.text} of type {expression.type.type.text} can't be assigned {expression_type}",
-                    line=expression.name.line)
-            expression_type = attr_type
-        else:
-            if not self.can_infer(expression_type):
-                self.error("Can't infer type from expression", line=expression.name.line)
-        self.current_class.scope.declare(expression.name.text, expression_type)
+        try:
+            expression_type = expression.expression.check(self, context)
+            if expression.type:
+                attr_type = expression.type.check(self, context)
+                if not self.can_assign(expression_type, attr_type):
+                    self.error(
+                        f"Attribute {expression.name.text} of type {expression.type.type.text} can't be assigned {expression_type}",
+                        line=expression.name.line)
+                expression_type = attr_type
+            else:
+                if not self.can_infer(expression_type):
+                    self.error("Can't infer type from expression", line=expression.name.line)
+        except CheckingError:
+            if expression.name.text in context.current_class.scope.variables:
+                raise
+            expression_type = Unknown
+        context.current_class.scope.declare(expression.name.text, expression_type)
 
     @visitor(SwitchNode)
-    def check(self, expression: SwitchNode):
+    def check(self, expression: SwitchNode, context: Context):
         var = expression.variable.text
-        var_type = self.scope.get(var)
+        scope = self.find_scope(var, context)
+        if scope:
+            var_type = scope.variables[var]
+        else:
+            try:
+                self.error(f"{var} not defined in current scope", token=expression.variable)
+            except CheckingError:
+                # The cases are still checked, with the value taken as any of them
+                var_type = Unknown
         for _case in expression.switch_cases:
-            c_type = self.get_class(_case)
-            if not isinstance(c_type, Class):
-                self.error(f"Can't cast to type {c_type}", line=_case.line)
-            if not self.can_assign(c_type, var_type):
-                self.error(f"Can't cast {var_type} to {c_type}", line=_case.line)
-            scope = Scope(self.scope)
+            try:
+                c_type = self.get_class(_case)
+                if not isinstance(c_type, Class):
+                    self.error(f"Can't cast to type {c_type}", line=_case.line)
+                if not self.can_assign(c_type, var_type):
+                    self.error(f"Can't cast {var_type} to {c_type}", line=_case.line)
+            except CheckingError:
+                c_type = Unknown
+            scope = Scope(context.scope)
             scope.declare(var, c_type)
-            self.check_block(expression.switch_cases[_case], scope)
-        self.check_block(expression.default, self.scope)
+            self.check_block(expression.switch_cases[_case], scope, context)
+        self.check_block(expression.default, context.scope, context)
         
     @visitor(CommentNode)
-    def check(self, expression: CommentNode):
+    def check(self, expression: CommentNode, context: Context):
         pass
 
-    def check_block(self, statements, scope: Scope):
-        previous = self.scope
+    def check_block(self, statements, scope: Scope, context: Context):
+        previous = context.scope
         try:
-            self.scope = scope
+            context.scope = scope
             for statement in statements:
-                self.check(statement)
+                try:
+                    self.check(statement, context)
+                except CheckingError:
+                    continue
         finally:
-            self.scope = previous
+            context.scope = previous
+
+    def check_condition(self, condition: Node, message: str, line: int, context: Context):
+        if not self.is_boolean(self.recover(condition, context)):
+            try:
+                self.error(message, line=line)
+            except CheckingError:
+                pass
+
+    def recover(self, node: Node, context: Context):
+        """
+        Checks the node, giving it the Unknown type if an error was found and the checker is collecting errors.
+        """
+        try:
+            return node.check(self, context)
+        except CheckingError:
+            return Unknown
 
     def check_functions_in_scope(self, scope: Scope, nodes: [Node]):
+        context = Context(self.globals)
         for _node in nodes:
             node = _node
             if isinstance(_node, Statement):
@@ -361,26 +450,30 @@ class TypeChecker(metaclass=Singleton):
             if isinstance(node, FunctionNode):
                 params = []
                 for param in node.params:
-                    params.append(param[1].check(self))
+                    params.append(self.recover(param[1], context))
                 if node.return_type.type.text == "Void" and not node.return_type.nested:
                     return_type = Null
                 else:
-                    return_type = node.return_type.check(self)
+                    return_type = self.recover(node.return_type, context)
                 scope.declare(node.name.text, Function(node.name.text, params, return_type, node.name.line))
 
     def check_classes_in_scope(self, nodes: [Node]):
+        context = Context(self.globals)
         for _node in nodes:
             node = _node
             if isinstance(_node, Statement):
                 node = _node.code
             if isinstance(node, ClassNode):
-                scope = Scope(self.scope)
+                scope = Scope(self.globals)
                 if node.superclass:
-                    super_class = self.get_class(node.superclass)
+                    try:
+                        super_class = self.get_class(node.superclass)
+                    except CheckingError:
+                        super_class = Object
                 else:
                     super_class = self.get_class('Object')
                 created = Class(node.name.text, super_class, scope)
-                self.types.append(created)
+                self.registry.declare(created)
         for _node in nodes:
             node = _node
             if isinstance(_node, Statement):
@@ -388,36 +481,45 @@ class TypeChecker(metaclass=Singleton):
             if isinstance(node, ClassNode):
                 c_class = self.get_class(node.name)
                 self.check_functions_in_scope(c_class.scope, node.methods)
-                self.check_class_inheritance(c_class)
+                try:
+                    self.check_class_inheritance(c_class)
+                except CheckingError:
+                    pass
                 params = []
                 try:
                     init = c_class.getattr("init")
-                    if not issubclass(init.return_type, Null):
-                        self.error("init method must have void return type", line=init.line)
                     params = init.param_types
-                except TypeError:
+                    if not self.registry.is_subtype(init.return_type, Null):
+                        self.error("init method must have void return type", line=init.line)
+                except (TypeError, CheckingError):
                     pass
                 for method in node.methods: #  type: FunctionNode
                     if method.name.text == 'init':
                         for statement in method.body: #  type: Statement
                             cur_node = statement.code
                             if isinstance(cur_node, AttrDeclaration):
-                                var_type = cur_node.type.check(self)
+                                var_type = self.recover(cur_node.type, context)
                                 c_class.scope.declare(cur_node.name.text, var_type)
-                self.scope.declare(node.name.text, Function(c_class.name, params, c_class))
+                self.globals.declare(node.name.text, Function(c_class.name, params, c_class))
+        for _node in nodes:
+            node = _node.code if isinstance(_node, Statement) else _node
+            if isinstance(node, ClassNode):
+                self.get_class(node.name).scope.flatten()
 
     def get_class(self, name: Token | str):
         text = name.text if isinstance(name, Token) else name
-        for t in self.types:
-            if str(t) == text:
-                return t
+        if t := self.find_type(text):
+            return t
         self.error(f"Class {text} not defined in scope", line=name.line)
 
-    def check_scope(self, name: str):
-        try:
-            return self.scope.get(name)
-        except:
-            return self.globals.get(name)
+    def find_type(self, text: str):
+        return self.registry.get(text) or self.builtins.get_class(text)
+
+    def check_scope(self, name: str, context: Context):
+        return self.find_scope(name, context).variables[name]
+
+    def find_scope(self, name: str, context: Context) -> Scope | None:
+        return context.scope.find(name) or self.globals.find(name)
 
     def check_class_inheritance(self, cls):
         if not isinstance(cls.__base__, Class):
@@ -425,10 +527,9 @@ class TypeChecker(metaclass=Singleton):
         for member in cls.scope.variables:
             current = cls.scope.variables[member]
             if isinstance(current, Function):
-                try:
-                    function = cls.scope.father.get(member)
-                except:
+                if not (scope := cls.scope.father.find(member)):
                     continue
+                function = scope.variables[member]
                 if current.name == "init":
                     continue
                 if len(function.param_types) != len(current.param_types):
@@ -442,10 +543,9 @@ class TypeChecker(metaclass=Singleton):
                         f"Return type defined in parent class as {function.return_type} type, not {current.return_type}",
                         line=current.line)
             else:
-                try:
-                    variable = cls.scope.father.get(member)
-                except:
+                if not (scope := cls.scope.father.find(member)):
                     continue
+                variable = scope.variables[member]
                 if not TypeChecker.can_assign(current, variable):
                     self.error(f"Variable {member} defined in parent class as {variable} type, not {current}",
                                line=member.line)
@@ -462,6 +562,8 @@ class TypeChecker(metaclass=Singleton):
         return False
 
     def can_assign(self, type1, type2):
+        if type1 is Unknown or type2 is Unknown:
+            return True
         if isinstance(type1, Function) or isinstance(type2, Function):
             return False
         if isinstance(type1, TypeList) and isinstance(type2, TypeList):
@@ -477,12 +579,15 @@ class TypeChecker(metaclass=Singleton):
                 return False
             return self.can_assign(type1.key_type, type2.key_type) and \
                    self.can_assign(type1.value_type, type2.value_type)
-        if issubclass(type1, Null) and isinstance(type2, Type):
+        if self.registry.is_subtype(type1, Null) and isinstance(type2, Type):
             return True
-        return issubclass(type1, type2)
+        return self.registry.is_subtype(type1, type2)
     
+    def is_boolean(self, _type: Type):
+        return _type is Unknown or self.registry.is_subtype(_type, Boolean)
+
     def can_infer(self, type: Type):
-        if type is None or issubclass(type, Null):
+        if type is None or self.registry.is_subtype(type, Null):
             return False
         if isinstance(type, TypeList):
             return self.can_infer(type.list_type)
@@ -499,10 +604,33 @@ class TypeChecker(metaclass=Singleton):
                 continue
             elif self.can_assign(_type, elem):
                 _type = elem
+            elif isinstance(_type, Type):
+                _type = self.registry.common_supertype(elem, _type)
             else:
-                while not issubclass(Object, elem):
-                    if self.can_assign(_type, elem):
-                        break
-                    elem = elem.__base__
-                _type = elem
+                _type = Object
         return _type
+
+
+worker_checker: TypeChecker | None = None
+worker_expressions: [Node] = []
+
+
+def init_worker(checker: TypeChecker, expressions: [Node]):
+    global worker_checker, worker_expressions
+    worker_checker = checker
+    worker_expressions = expressions
+    checker.error.collect = True
+
+
+def check_declaration(index: int) -> ([Diagnostic], {int: str}):
+    """
+    Checks a top level declaration in a context of its own. Returns its diagnostics and the names of the recorded
+    types that the parent can resolve back, which are the ones declared before the fork and Null.
+    """
+    checker = worker_checker
+    checker.error.diagnostics, checker.error.reported = [], set()
+    context = Context(checker.globals)
+    checker.check_block([worker_expressions[index]], checker.globals, context)
+    types = {key: str(_type) for key, _type in context.types.items()
+             if _type is Null or isinstance(_type, Type) and checker.registry.get(str(_type)) is _type}
+    return checker.error.diagnostics, types
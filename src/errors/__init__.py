@@ -1,2 +1,3 @@
 from .parsing import UnexpectedToken
-from .error import Error
+from .checking import CheckingError
+from .error import Error, Diagnostic
@@ -0,0 +1,8 @@
+class CheckingError(Exception):
+    """
+    Raised by Error when errors are collected, so that the checker can skip the failing construct and keep going.
+    """
+
+    def __init__(self, diagnostic):
+        super().__init__(diagnostic.message)
+        self.diagnostic = diagnostic
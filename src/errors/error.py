@@ -1,26 +1,103 @@
+import json
+from array import array
 from sys import stderr
 
+from .checking import CheckingError
+
+
+class Diagnostic:
+
+    def __init__(self, message: str, line: int = -1, column: int = -1, length: int = 0):
+        self.message = message
+        self.line = line
+        self.column = column
+        self.length = length
+
+    def key(self):
+        return self.message, self.line, self.column
+
+    def to_dict(self):
+        return {'message': self.message, 'line': self.line, 'column': self.column, 'length': self.length}
+
 
 class Error:
+    """
+    Reports compilation errors. By default the first error is printed and the compilation stops; with collect,
+    errors are accumulated, raised as CheckingError for the checker to recover, and printed together by report.
+    """
 
-    def __init__(self, program: str, error_out=stderr):
-        self.program = program.splitlines()
+    def __init__(self, program: str, error_out=stderr, collect=False, output_format='text'):
+        # The source is shared with the tokenizer, lines are only sliced out of it when an error is printed.
+        self.program = program
+        self._line_offsets = None
         self.error_out = error_out
+        self.collect = collect
+        self.output_format = output_format
+        self.diagnostics: [Diagnostic] = []
+        self.reported = set()
 
-    def print_token(self, token):
-        self.print_line(token.line)
-        spaces = " " * (1 + len(str(token.line)) + token.column)
-        pointer = "^" * len(token.text)
-        print(f"{spaces}{pointer}", file=self.error_out)
+    @property
+    def line_offsets(self) -> array:
+        """
+        Offset in the program where each line starts, built the first time a line is needed.
+        """
+        if self._line_offsets is None:
+            self._line_offsets = array('q', [0])
+            index = self.program.find('\n')
+            while index != -1:
+                self._line_offsets.append(index + 1)
+                index = self.program.find('\n', index + 1)
+        return self._line_offsets
+
+    def get_line(self, line: int) -> str:
+        start = self.line_offsets[line - 1]
+        end = self.line_offsets[line] - 1 if line < len(self.line_offsets) else len(self.program)
+        return self.program[start:end].rstrip('\r')
 
     def print_line(self, line: int):
-        code_line = self.program[line - 1]
+        code_line = self.get_line(line)
         print(f"{line}|{code_line}", file=self.error_out)
 
-    def __call__(self, message: str, *, line: int = -1, token=None):
-        print(message, file=self.error_out)
-        if token:
-            self.print_token(token)
-        elif line != -1:
-            self.print_line(line)
+    def print_diagnostic(self, diagnostic: Diagnostic):
+        print(diagnostic.message, file=self.error_out)
+        if diagnostic.column != -1:
+            self.print_line(diagnostic.line)
+            spaces = " " * (1 + len(str(diagnostic.line)) + diagnostic.column)
+            print(f"{spaces}{'^' * max(diagnostic.length, 1)}", file=self.error_out)
+        elif diagnostic.line != -1:
+            self.print_line(diagnostic.line)
+
+    def report(self):
+        """
+        Prints every collected error and stops the compilation if there was any.
+        """
+        if not self.diagnostics:
+            return
+        if self.output_format == 'json':
+            json.dump([diagnostic.to_dict() for diagnostic in self.diagnostics], self.error_out, indent=2)
+            print(file=self.error_out)
+        else:
+            for diagnostic in self.diagnostics:
+                self.print_diagnostic(diagnostic)
         exit(1)
+
+    def add(self, diagnostic: Diagnostic):
+        """
+        Records the diagnostic, or prints it and stops the compilation if errors are not collected.
+        """
+        if not self.collect:
+            self.print_diagnostic(diagnostic)
+            exit(1)
+        if diagnostic.key() not in self.reported:
+            self.reported.add(diagnostic.key())
+            self.diagnostics.append(diagnostic)
+
+    def __call__(self, message: str, *, line: int = -1, token=None, fatal=False):
+        if token:
+            diagnostic = Diagnostic(message, token.line, token.column, token.length)
+        else:
+            diagnostic = Diagnostic(message, line)
+        self.add(diagnostic)
+        if fatal:
+            self.report()
+        raise CheckingError(diagnostic)
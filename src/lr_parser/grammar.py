@@ -199,6 +199,21 @@ class AttributedProduction(Production):
         self.attribute = attribute
 
 
+def identity(x):
+    """
+    Attribute of unit productions that just pass their only value up. The parser skips these reductions.
+    """
+    return x[0]
+
+
+def push(items: list, item) -> list:
+    """
+    Appends item in place and passes the list up, so left recursive list productions are built in linear time.
+    """
+    items.append(item)
+    return items
+
+
 def CreateTerminals(terminals: List[str]) -> List[Terminal]:
     return [Terminal(s) for s in terminals]
 
@@ -5,7 +5,7 @@ from enum import Enum, auto
 from errors import UnexpectedToken
 
 
-from lr_parser.grammar import Grammar
+from lr_parser.grammar import Grammar, identity
 
 
 class Action(Enum):
@@ -23,6 +23,7 @@ class ShiftReduceParser:
         self.goto = {}
         self.index_action = {}
         self.index_goto = {}
+        self.unit_goto = {}
         loaded = False
         if path:
             try:
@@ -36,10 +37,30 @@ class ShiftReduceParser:
             # pickle save
             if path:
                 self.pickle_save(path)
+        self._build_unit_goto()
         
     @abstractmethod
     def _build_parsing_table(self):
         pass
+
+    def _build_unit_goto(self):
+        """
+        For every GOTO entry and lookahead, precomputes where the chain of identity unit reductions that follows it
+        ends (Expression -> Logic -> ... -> Primary), so the parser jumps there instead of reducing once per level.
+        """
+        unit_reduces = {}
+        for (state, lookahead), (action, tag) in self.action.items():
+            if action == Action.REDUCE and len(tag.Right) == 1 and tag.Right.symbols[0].IsNonTerminal \
+                    and getattr(tag, 'attribute', None) is identity:
+                unit_reduces.setdefault(state, {})[lookahead] = tag
+        self.unit_goto = {}
+        for (state, left), goto in self.goto.items():
+            for lookahead in unit_reduces.get(goto, ()):
+                current, target = left, goto
+                while tag := unit_reduces.get(target, {}).get(lookahead):
+                    current = tag.Left
+                    target = self.goto[state, current]
+                self.unit_goto[state, left, lookahead] = current, target
     
     def __call__(self, w):
         stack = [0]
@@ -73,8 +94,11 @@ class ShiftReduceParser:
                         stack.pop()
                         assert stack.pop() == symbol
                     output.append(tag)
-                    goto = self.goto[stack[-1], tag.Left]
-                    stack.append(tag.Left)
+                    if bypass := self.unit_goto.get((stack[-1], tag.Left, lookahead)):
+                        left, goto = bypass
+                    else:
+                        left, goto = tag.Left, self.goto[stack[-1], tag.Left]
+                    stack.append(left)
                     stack.append(goto)
                 case Action.OK:
                     stack.pop()
@@ -0,0 +1 @@
+from .pass_manager import PassManager
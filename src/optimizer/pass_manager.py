@@ -0,0 +1,43 @@
+import time
+
+from _parser.nodes import Node
+from builtin._types import Type
+from tokenizer.token_ import Token
+from .passes import ConstantFolding, DeadBranchElimination, CommonSubexpressionElimination, \
+    LoopInvariantHoisting, nodes
+
+
+class PassManager:
+    """
+    Runs the optimisation passes of a level over the checked AST, in order, and times each of them.
+    """
+
+    levels: {int: [type]} = {
+        0: [],
+        1: [ConstantFolding, DeadBranchElimination],
+        2: [ConstantFolding, DeadBranchElimination, CommonSubexpressionElimination, LoopInvariantHoisting],
+    }
+
+    def __init__(self, level: int, types: {int: Type}):
+        self.passes: [type] = list(self.levels[level])
+        self.types = types
+        self.timings: [(str, float)] = []
+
+    def add(self, _pass: type) -> None:
+        self.passes.append(_pass)
+
+    def run(self, expressions: [Node]) -> [Node]:
+        # Names in the program, which the temporary variables of the passes must not take
+        names = set()
+        for expression in expressions:
+            for node in nodes(expression):
+                names.update(value.text for value in map(node.__getattribute__, node.__slots__)
+                             if isinstance(value, Token))
+        for _pass in self.passes:
+            start = time.perf_counter()
+            expressions = _pass(self.types, names).run(expressions)
+            self.timings.append((_pass.name, time.perf_counter() - start))
+        return expressions
+
+    def report(self) -> str:
+        return '\n'.join(f"{name}: {seconds * 1000:.2f} ms" for name, seconds in self.timings)
@@ -0,0 +1,492 @@
+import operator
+from copy import deepcopy
+
+from _parser.nodes import *
+from builtin._types import Type
+from builtin.builtin import Builtins
+from tokenizer.token_ import Token
+from tokenizer.token_type import TokenType
+
+# Builtins whose calls have no side effects, so calling them once or several times gives the same program.
+pure_functions = {'pow', 'max', 'min', 'len', 'golden', 'infinity'}
+
+
+class Pass:
+    """
+    Rewrites the AST bottom up. A node is replaced by what rewrite returns for it, and a statement may be
+    replaced by a list of statements. Nodes that take the place of others keep their recorded type.
+    """
+    name = 'pass'
+
+    def __init__(self, types: {int: Type}, names: {str}):
+        self.types = types
+        self.names = names
+        self.counter = 0
+
+    def run(self, expressions: [Node]) -> [Node]:
+        return self.block(expressions)
+
+    def block(self, nodes: list) -> list:
+        result = []
+        for node in nodes:
+            if isinstance(node, Node):
+                node = self.visit(node)
+            if isinstance(node, list):
+                result.extend(node)
+            else:
+                result.append(node)
+        return result
+
+    def visit(self, node: Node) -> Node | list:
+        for field in node.__slots__:
+            value = getattr(node, field)
+            if isinstance(value, Node):
+                setattr(node, field, self.visit(value))
+            elif isinstance(value, list):
+                setattr(node, field, self.block(value))
+            elif isinstance(value, dict):
+                setattr(node, field, {key: self.block(nodes) for key, nodes in value.items()})
+        new = self.rewrite(node)
+        if new is not node and isinstance(new, Node):
+            self.record(new, self.types.get(id(node)))
+        return new
+
+    def rewrite(self, node: Node) -> Node | list:
+        return node
+
+    def record(self, node: Node, _type: Type | None) -> Node:
+        """
+        Sets the type of a node that was not checked. Ids of the nodes dropped by a pass may be reused by new ones,
+        so their entries are overwritten.
+        """
+        if _type is None:
+            self.types.pop(id(node), None)
+        else:
+            self.types[id(node)] = _type
+        return node
+
+    def temporary(self, expression: Node) -> (Variable, Statement):
+        """
+        Variable holding the value of the expression, and the statement that declares it.
+        """
+        while f'_t{self.counter}' in self.names:
+            self.counter += 1
+        name = f'_t{self.counter}'
+        self.names.add(name)
+        variable = self.record(Variable(Token(0, 0, TokenType.IDENTIFIER, name)), self.types.get(id(expression)))
+        declaration = self.record(VarDeclaration(variable.name, None, expression), None)
+        return variable, self.record(Statement(declaration), None)
+
+    def share(self, expression: Node, expression_key: tuple, temporaries: {tuple: Variable},
+              declarations: [Statement]) -> Variable:
+        """
+        Variable that replaces the expression, declared the first time an expression with its key is replaced.
+        """
+        if expression_key not in temporaries:
+            variable, declaration = self.temporary(expression)
+            declarations.append(declaration)
+            temporaries[expression_key] = variable
+        variable = temporaries[expression_key]
+        return self.record(Variable(variable.name), self.types.get(id(variable)))
+
+    def ungroup(self, grouping: Grouping, replace) -> Node:
+        """
+        Replaces the expression in the parentheses, and drops them if it became a variable.
+        """
+        grouping.expression = replace(grouping.expression)
+        if isinstance(grouping.expression, Variable):
+            return self.record(grouping.expression, self.types.get(id(grouping)))
+        return grouping
+
+
+class ConstantFolding(Pass):
+    """
+    Evaluates the operators applied to number and boolean literals and the constant builtins, and the logic
+    operators whose left operand decides the result.
+    """
+    name = 'constant-folding'
+
+    operators = {
+        TokenType.PLUS: operator.add, TokenType.MINUS: operator.sub, TokenType.MULTIPLY: operator.mul,
+        TokenType.DIVIDE: operator.truediv, TokenType.MODULO: operator.mod, TokenType.LESS: operator.lt,
+        TokenType.LESS_EQUAL: operator.le, TokenType.GREATER: operator.gt, TokenType.GREATER_EQUAL: operator.ge,
+        TokenType.EQUAL_EQUAL: operator.eq, TokenType.EQUAL_DIFFERENT: operator.ne
+    }
+
+    def __init__(self, types: {int: Type}, names: {str}):
+        super().__init__(types, names)
+        # Values the runtime gives for the builtins that always return the same number
+        self.constants: {str: float} = Builtins().constants
+
+    def rewrite(self, node: Node) -> Node:
+        if isinstance(node, Call) and not node.arguments and isinstance(node.called, Variable) and \
+                node.called.name.text in self.constants:
+            return Literal(self.constants[node.called.name.text])
+        if isinstance(node, Grouping) and isinstance(node.expression, Literal):
+            return node.expression
+        if isinstance(node, Unary) and isinstance(node.right, Literal):
+            value = node.right.value
+            if node.operator.type == TokenType.MINUS and is_number(value):
+                return Literal(-value)
+            if node.operator.type == TokenType.EXCLAMATION and isinstance(value, bool):
+                return Literal(not value)
+        if isinstance(node, Binary) and isinstance(node.left, Literal) and isinstance(node.left.value, bool):
+            # false && x and true || x are decided without evaluating x, true && x and false || x are x
+            if node.operator.type == TokenType.AND:
+                return node.right if node.left.value else node.left
+            if node.operator.type == TokenType.OR:
+                return node.left if node.left.value else node.right
+        if isinstance(node, Binary) and isinstance(node.left, Literal) and isinstance(node.right, Literal):
+            return self.fold(node) or node
+        return node
+
+    def fold(self, node: Binary) -> Literal | None:
+        left, right = node.left.value, node.right.value
+        if node.operator.type not in self.operators:
+            return None
+        if node.operator.type in (TokenType.EQUAL_EQUAL, TokenType.EQUAL_DIFFERENT):
+            if not (is_number(left) and is_number(right) or isinstance(left, bool) and isinstance(right, bool)):
+                return None
+        elif not is_number(left) or not is_number(right):
+            return None
+        if node.operator.type in (TokenType.DIVIDE, TokenType.MODULO) and right == 0:
+            return None
+        value = self.operators[node.operator.type](left, right)
+        # Literals are written back as their str, which must stay a valid Python number
+        if isinstance(value, float) and value - value != 0:
+            return None
+        return Literal(value)
+
+
+class DeadBranchElimination(Pass):
+    """
+    Replaces the if statements with a literal condition by the branch that is taken, and removes the while loops
+    that are never entered.
+    """
+    name = 'dead-branch-elimination'
+
+    def rewrite(self, node: Node) -> Node | list:
+        if not isinstance(node, Statement):
+            return node
+        code = node.code
+        if isinstance(code, If) and isinstance(code.condition, Literal) and isinstance(code.condition.value, bool):
+            return code.code if code.condition.value else code.else_code
+        if isinstance(code, While) and isinstance(code.condition, Literal) and code.condition.value is False:
+            return []
+        return node
+
+
+class CommonSubexpressionElimination(Pass):
+    """
+    Computes once the expressions repeated in a statement, in variables declared before it. Only statements
+    without calls to functions with side effects are rewritten, so evaluating them earlier changes nothing.
+    """
+    name = 'common-subexpression-elimination'
+
+    def rewrite(self, node: Node) -> Node | list:
+        if not isinstance(node, Statement) or \
+                not isinstance(node.code, VarDeclaration | Assignment | ExpressionStatement | Return | AttrDeclaration):
+            return node
+        if not pure(node.code):
+            return node
+        declarations = []
+        self.extract(node.code, declarations)
+        return [*declarations, node] if declarations else node
+
+    def extract(self, node: Node, declarations: [Statement]) -> None:
+        counts = {}
+        for expression in evaluated(node):
+            if self.candidate(expression):
+                counts[key(expression)] = counts.get(key(expression), 0) + 1
+        temporaries = {}
+
+        def replace(expression: Node) -> Node:
+            if self.candidate(expression) and counts[key(expression)] > 1:
+                expression_key = key(expression)
+                if expression_key not in temporaries:
+                    self.extract(expression, declarations)
+                return self.share(expression, expression_key, temporaries, declarations)
+            if isinstance(expression, Grouping):
+                return self.ungroup(expression, replace)
+            if is_logic(expression):
+                expression.left = replace(expression.left)
+            else:
+                replace_children(expression, replace)
+            return expression
+
+        replace_children(node, replace)
+
+    def candidate(self, expression: Node) -> bool:
+        return isinstance(expression, Binary | Unary | Call) and id(expression) in self.types
+
+
+class LoopInvariantHoisting(Pass):
+    """
+    Computes before a loop the arithmetic on variables that the loop doesn't assign. Any of them may be null, so
+    only the expressions evaluated on every iteration before anything with side effects are moved, and those of
+    the body are computed under a check that the loop runs at least once: its condition, or the length of the
+    iterable of a for.
+    """
+    name = 'loop-invariant-hoisting'
+
+    def __init__(self, types: {int: Type}, names: {str}):
+        super().__init__(types, names)
+        self.hoisted: {str} = set()
+
+    def rewrite(self, node: Node) -> Node | list:
+        if not isinstance(node, Statement) or not isinstance(node.code, While | ForNode):
+            return node
+        loop = node.code
+        body = loop.code if isinstance(loop, While) else loop.statements
+        guarded = self.guard(loop) is not None
+        statements, call = unconditional(body) if guarded else ([], None)
+        assigned = assigned_names(loop)
+        # Variables hoisted out of the loops nested in this one may go further out
+        moved = [statement for statement in statements if isinstance(statement.code, VarDeclaration) and
+                 statement.code.name.text in self.hoisted and invariant(statement.code.expression, assigned)]
+        body[:] = [statement for statement in body if all(statement is not other for other in moved)]
+        statements = [statement for statement in statements if all(statement is not other for other in moved)]
+        assigned = assigned_names(loop)
+        temporaries = {}
+
+        def hoist(declarations: [Statement]):
+            def replace(expression: Node) -> Node:
+                if isinstance(expression, Binary | Unary) and id(expression) in self.types and \
+                        invariant(expression, assigned) and any(isinstance(e, Variable) for e in expressions(expression)):
+                    variable = self.share(expression, key(expression), temporaries, declarations)
+                    self.hoisted.add(variable.name.text)
+                    return variable
+                if isinstance(expression, Grouping):
+                    return self.ungroup(expression, replace)
+                # The right operand of a logic operator is not always evaluated
+                if is_logic(expression):
+                    expression.left = replace(expression.left)
+                    return expression
+                replace_children(expression, replace)
+                return expression
+            return replace
+
+        # The condition of a while is evaluated before the loop runs, so its invariants need no check
+        before = []
+        if isinstance(loop, While) and pure(loop.condition):
+            loop.condition = hoist(before)(loop.condition)
+        declarations = list(moved)
+        replace = hoist(declarations)
+        for statement in statements:
+            replace_children(statement.code, replace)
+        if call:
+            call.arguments = [replace(argument) for argument in call.arguments]
+
+        if not declarations:
+            return [*before, node] if before else node
+        guard = self.guard(loop)
+        if isinstance(guard, Literal) and guard.value is True:
+            return [*before, *declarations, node]
+        if isinstance(loop, ForNode):
+            guard = self.length(loop, before)
+        else:
+            guard = self.duplicate(guard)
+        check = self.record(If(loop.start, guard, [*declarations, node], []), None)
+        return [*before, self.record(Statement(check), None)]
+
+    @staticmethod
+    def guard(loop: While | ForNode) -> Node | None:
+        """
+        Condition that holds when the loop runs at least once and can be evaluated once more ahead of it, or a true
+        literal when the loop always runs. None when there is no such condition. A for is checked by the length of
+        its iterable, which is evaluated once either way.
+        """
+        if isinstance(loop, While):
+            if isinstance(loop.condition, Literal) and loop.condition.value is True:
+                return loop.condition
+            return loop.condition if pure(loop.condition) else None
+        if isinstance(loop.iterable, ArrayNode) and loop.iterable.expressions:
+            return Literal(True)
+        return loop.iterable
+
+    def length(self, loop: ForNode, before: [Statement]) -> Call:
+        """
+        Length of the iterable of the for, which is evaluated once ahead of it. A null iterable fails there as the
+        loop would, instead of skipping it.
+        """
+        if not isinstance(loop.iterable, Variable):
+            variable, declaration = self.temporary(loop.iterable)
+            before.append(declaration)
+            loop.iterable = self.record(Variable(variable.name), self.types.get(id(variable)))
+        function = self.record(Variable(Token(0, 0, TokenType.IDENTIFIER, 'len')), None)
+        return self.record(Call(function, [self.duplicate(loop.iterable)], loop.start.line), None)
+
+    def duplicate(self, expression: Node) -> Node:
+        """
+        Copy of the expression, with the types of its nodes.
+        """
+        copy = deepcopy(expression)
+        for original, node in zip(nodes(expression), nodes(copy)):
+            self.record(node, self.types.get(id(original)))
+        return copy
+
+
+def is_number(value) -> bool:
+    return isinstance(value, int | float) and not isinstance(value, bool)
+
+
+def key(node: Node) -> tuple:
+    """
+    Structural key of an expression, equal for the expressions that always give the same value.
+    """
+    if isinstance(node, Grouping):
+        return key(node.expression)
+    if isinstance(node, Literal):
+        return 'literal', type(node.value), node.value
+    if isinstance(node, Variable):
+        return 'variable', node.name.text
+    if isinstance(node, SelfNode):
+        return 'self',
+    if isinstance(node, GetNode):
+        return 'get', key(node.left), node.right.text
+    if isinstance(node, Unary):
+        return 'unary', node.operator.type, key(node.right)
+    if isinstance(node, Binary):
+        return 'binary', node.operator.type, key(node.left), key(node.right)
+    if isinstance(node, Call):
+        return 'call', key(node.called), *map(key, node.arguments)
+    return 'node', id(node)
+
+
+def pure(node: Node) -> bool:
+    """
+    Whether evaluating the statement or expression only calls functions without side effects.
+    """
+    for expression in expressions(node):
+        if isinstance(expression, Call) and \
+                not (isinstance(expression.called, Variable) and expression.called.name.text in pure_functions):
+            return False
+        if isinstance(expression, ArrayNode | DictionaryNode | Index | SuperNode):
+            return False
+    return True
+
+
+def unconditional(body: [Statement]) -> ([Statement], Call | None):
+    """
+    Statements at the start of a loop body that run on every iteration before anything with side effects, and the
+    call of the first statement with side effects when its arguments are evaluated before it.
+    """
+    statements = []
+    for statement in body:
+        code = statement.code
+        if isinstance(code, CommentNode):
+            continue
+        if not isinstance(code, VarDeclaration | Assignment | ExpressionStatement | Call):
+            break
+        if pure(statement):
+            statements.append(statement)
+            continue
+        value = code.value if isinstance(code, Assignment) else code if isinstance(code, Call) else code.expression
+        if isinstance(value, Call) and pure(value.called) and all(map(pure, value.arguments)):
+            return statements, value
+        break
+    return statements, None
+
+
+def invariant(node: Node, assigned: {str}) -> bool:
+    """
+    Whether the expression is arithmetic on literals and variables not in assigned that can only fail on a null.
+    """
+    if isinstance(node, Grouping):
+        return invariant(node.expression, assigned)
+    if isinstance(node, Literal):
+        return True
+    if isinstance(node, Variable):
+        return node.name.text not in assigned
+    if isinstance(node, Unary):
+        return node.operator.type == TokenType.MINUS and invariant(node.right, assigned)
+    if isinstance(node, Binary):
+        if node.operator.type in (TokenType.DIVIDE, TokenType.MODULO):
+            if not isinstance(node.right, Literal) or not is_number(node.right.value) or node.right.value == 0:
+                return False
+        elif node.operator.type not in (TokenType.PLUS, TokenType.MINUS, TokenType.MULTIPLY):
+            return False
+        return invariant(node.left, assigned) and invariant(node.right, assigned)
+    return False
+
+
+def assigned_names(node: Node) -> {str}:
+    names = set()
+    for child in nodes(node):
+        if isinstance(child, VarDeclaration):
+            names.add(child.name.text)
+        elif isinstance(child, Assignment) and isinstance(child.left, Variable):
+            names.add(child.left.name.text)
+        elif isinstance(child, ForNode):
+            names.add(child.variable.text)
+    return names
+
+
+def nodes(node: Node):
+    """
+    The node and every node below it, parents first.
+    """
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        yield node
+        children = []
+        for field in node.__slots__:
+            value = getattr(node, field)
+            if isinstance(value, Node):
+                children.append(value)
+            elif isinstance(value, list):
+                children.extend(item for item in value if isinstance(item, Node))
+            elif isinstance(value, dict):
+                children.extend(item for items in value.values() for item in items)
+        stack.extend(reversed(children))
+
+
+def expressions(node: Node):
+    """
+    The expressions in the node and below it.
+    """
+    for child in nodes(node):
+        if not isinstance(child, Statement | VarType):
+            yield child
+
+
+def evaluated(node: Node):
+    """
+    The expressions in the statement or expression that are evaluated every time it is, which are all of them but
+    the right operands of the logic operators.
+    """
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        yield node
+        if is_logic(node):
+            stack.append(node.left)
+        else:
+            replace_children(node, lambda child: stack.append(child) or child)
+
+
+def is_logic(node: Node) -> bool:
+    return isinstance(node, Binary) and node.operator.type in (TokenType.AND, TokenType.OR)
+
+
+def replace_children(node: Node, replace) -> None:
+    """
+    Replaces the expressions directly below the node by what replace gives for them. Nested blocks are left alone.
+    """
+    for field in node.__slots__:
+        value = getattr(node, field)
+        if isinstance(value, Node) and not isinstance(value, Statement | VarType):
+            setattr(node, field, replace(value))
+        elif isinstance(value, list) and isinstance(node, Call | ArrayNode | DictionaryNode):
+            setattr(node, field, [replace(item) for item in value])
+
+
+def replace_statements(statements: [Node], replace) -> None:
+    """
+    Replaces the expressions of the statements, and of the statements nested in their blocks.
+    """
+    for statement in statements:
+        for child in nodes(statement):
+            if isinstance(child, Statement):
+                replace_children(child.code, replace)
@@ -1,6 +1,6 @@
 import string
 
-from automata.automata import Automata
+from automata.automata import Automata, CharClass
 from tools.decorators import only_once
 
 
@@ -13,6 +13,10 @@ def simple_automata(char: str, tags) -> Automata:
     return Automata(2, {(0, char): (1,)}, {1: tags})
 
 
+def class_automata(char_class: CharClass, tags) -> Automata:
+    return Automata(2, {(0, char_class): (1,)}, {1: tags})
+
+
 def join_automatas(*automatas: Automata) -> Automata:
     if len(automatas) == 1:
         return automatas[0]
@@ -21,14 +25,14 @@ def join_automatas(*automatas: Automata) -> Automata:
 
 @only_once
 def LetterAutomata() -> Automata:
-    return join_automatas(*[simple_automata(char, []) for char in string.ascii_letters])
+    return class_automata(CharClass.of(string.ascii_letters), [])
 
 
 @only_once
 def NumberAutomata() -> Automata:
-    return join_automatas(*[simple_automata(char, []) for char in string.digits])
+    return class_automata(CharClass.of(string.digits), [])
 
 
 @only_once
 def NumberAndLetterAutomata() -> Automata:
-    return LetterAutomata().union(NumberAutomata())
+    return class_automata(CharClass.of(string.ascii_letters + string.digits), [])
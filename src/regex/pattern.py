@@ -0,0 +1,81 @@
+from functools import lru_cache
+from typing import Iterator
+
+from automata.automata import LazyAutomata
+from regex.regex_ import compile_regex
+
+cache_size = 256
+
+
+@lru_cache(maxsize=cache_size)
+def cached_regex(pattern: str) -> LazyAutomata:
+    """
+    Lazy DFA of the pattern, only the cache_size most recently used ones are kept.
+    """
+    return compile_regex(pattern, lazy=True)
+
+
+class Match:
+    
+    def __init__(self, string: str, start: int, end: int):
+        self.string = string
+        self.start = start
+        self.end = end
+    
+    def group(self) -> str:
+        return self.string[self.start:self.end]
+    
+    def span(self) -> (int, int):
+        return self.start, self.end
+    
+    def __repr__(self):
+        return f"<Match span={self.span()} match={self.group()!r}>"
+
+
+class Pattern:
+    """
+    Regex of the project's engine with search, fullmatch and finditer. Patterns are compiled once, through a
+    bounded LRU cache keyed by the pattern string.
+    """
+    
+    def __init__(self, pattern: str):
+        self.pattern = pattern
+        self.automata = cached_regex(pattern)
+    
+    def longest(self, string: str, pos: int) -> int:
+        """
+        End of the longest match that starts at pos, or -1.
+        """
+        automata = self.automata
+        state = automata.initial_state
+        end = pos if state in automata.final_states else -1
+        for i in range(pos, len(string)):
+            state = automata.step(state, string[i])
+            if state is None:
+                break
+            if state in automata.final_states:
+                end = i + 1
+        return end
+    
+    def match(self, string: str, pos: int = 0) -> Match | None:
+        end = self.longest(string, pos)
+        return Match(string, pos, end) if end != -1 else None
+    
+    def fullmatch(self, string: str) -> Match | None:
+        end = self.longest(string, 0)
+        return Match(string, 0, end) if end == len(string) else None
+    
+    def search(self, string: str, pos: int = 0) -> Match | None:
+        for start in range(pos, len(string) + 1):
+            if (end := self.longest(string, start)) != -1:
+                return Match(string, start, end)
+        return None
+    
+    def finditer(self, string: str) -> Iterator[Match]:
+        pos = 0
+        while pos <= len(string) and (match := self.search(string, pos)):
+            yield match
+            pos = match.end if match.end > match.start else match.end + 1
+    
+    def __repr__(self):
+        return f"Pattern({self.pattern!r})"
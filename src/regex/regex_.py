@@ -1,7 +1,8 @@
 from typing import List
 
 from lr_parser.lr1_parser import LR1Parser
-from lr_parser.grammar import Grammar, NonTerminal, Terminal, CreateTerminals, CreateNonTerminals, Epsilon
+from lr_parser.grammar import Grammar, NonTerminal, Terminal, CreateTerminals, CreateNonTerminals, Epsilon, \
+    identity
 from lr_parser.lr_utils import evaluate_reverse_parser
 from tools.decorators import only_once
 from regex.regex_ast import ConcatNode, UnionNode, StarNode, SymbolNode, MaybeNode, NumberNode, \
@@ -20,21 +21,21 @@ def RegParser(path=None):
     
     RegGrammar = Grammar(non_terminals, terminals, E, [
         E > (E + pipe + A | A | e,
-             lambda x: UnionNode(x[0], x[2]), lambda x: x[0], lambda x: EpsilonNode()),
+             lambda x: UnionNode(x[0], x[2]), identity, lambda x: EpsilonNode()),
         A > (A + S | S,
-             lambda x: ConcatNode(x[0], x[1]), lambda x: x[0]),
+             lambda x: ConcatNode(x[0], x[1]), identity),
         S > (B + star | B + plus | B + maybe | B,
              lambda x: StarNode(x[0]), lambda x: PlusNode(x[0]),
-             lambda x: MaybeNode(x[0]), lambda x: x[0]),
+             lambda x: MaybeNode(x[0]), identity),
         B > (symbol | o_par + E + c_par | o_bracket + G + c_bracket | number | letter | alphanum,
              lambda x: SymbolNode(x[0]), lambda x: x[1], lambda x: x[1], lambda x: NumberNode(),
              lambda x: LetterNode(), lambda x: NumberAndLetterNode()),
         G > (compliment + F | F,
              lambda x: BracketComplimentNode(x[1]), lambda x: BracketNode(x[0])),
         F > (F + V | V,
-             lambda x: ConcatInBracketsNode(x[0], x[1]), lambda x: x[0]),
+             lambda x: ConcatInBracketsNode(x[0], x[1]), identity),
         V > (V + minus + K | K,
-             lambda x: RangeNode(x[0], x[2]), lambda x: x[0]),
+             lambda x: RangeNode(x[0], x[2]), identity),
         K > (symbol,
              lambda x: SymbolInBracketsNode(x[0]))
     ])
@@ -56,22 +57,18 @@ def _tokenize(regex: str):
 
 
 def _map_to_regex(tokens: List[str], non_terminals: List[Terminal], default: Terminal):
+    names = {non_terminal.Name: non_terminal for non_terminal in non_terminals}
     mapped_tokens = []
     brackets = False
     for x in tokens:
-        matched = False
-        for non_terminal in non_terminals:
-            if not brackets and x not in '^-' and non_terminal.Name == x:
-                matched = True
-                mapped_tokens.append(non_terminal)
-                if x == '[':
-                    brackets = True
-            elif brackets and x in '^-]' and non_terminal.Name == x:
-                matched = True
-                mapped_tokens.append(non_terminal)
-                if x == ']':
-                    brackets = False
-        if not matched:
+        # Inside brackets only ^, - and ] are operators, outside them every operator but ^ and -
+        if (x in '^-]' if brackets else x not in '^-') and x in names:
+            mapped_tokens.append(names[x])
+            if x == '[':
+                brackets = True
+            elif x == ']':
+                brackets = False
+        else:
             mapped_tokens.append(default)
     return mapped_tokens
 
@@ -86,7 +83,15 @@ def _unescape_tokens(tokens: List[str], mapped: List[Terminal], symbol: Terminal
     return tokens_
 
 
-def compile_regex(regex: str):
+def compile_regex(regex: str, lazy: bool = False):
+    """
+    DFA of the regex. A lazy one only builds its states while matching.
+    """
+    automata = regex_automata(regex)
+    return automata.lazy_dfa() if lazy else automata.dfa()
+
+
+def regex_automata(regex: str):
     parser = RegParser()
     
     tokens = _tokenize(regex)
@@ -101,6 +106,4 @@ def compile_regex(regex: str):
     
     ast = evaluate_reverse_parser(parsed, operations, real_tokens + [parser.G.EOF])
     
-    automata = ast.evaluate()
-    
-    return automata.dfa()
+    return ast.evaluate()
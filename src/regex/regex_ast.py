@@ -2,9 +2,9 @@ import string
 from typing import List
 
 from __ast.ast_abstract import AtomicNode, UnaryNode, BinaryNode
-from automata.automata import Automata
-from regex.automata_creation import epsilon_automata, simple_automata, LetterAutomata, NumberAutomata, \
-    NumberAndLetterAutomata, join_automatas
+from automata.automata import Automata, CharClass
+from regex.automata_creation import epsilon_automata, simple_automata, class_automata, LetterAutomata, \
+    NumberAutomata, NumberAndLetterAutomata
 
 
 class EpsilonNode(AtomicNode):
@@ -79,22 +79,22 @@ class ConcatNode(BinaryNode):
         return left_value.concat(right_value)
 
 
+def bracket_class(value) -> CharClass:
+    if not isinstance(value, list):
+        value = [value]
+    return CharClass((x, x) if isinstance(x, int) else x for x in value)
+
+
 class BracketNode(UnaryNode):
     
     def operate(self, value):
-        if not isinstance(value, list):
-            value = [value]
-        return join_automatas(*[simple_automata(chr(x), []) for x in value])
+        return class_automata(bracket_class(value), [])
 
 
 class BracketComplimentNode(UnaryNode):
     
     def operate(self, value):
-        if not isinstance(value, list):
-            value = [value]
-        value = list(map(chr, value))
-        value = [x for x in string.printable if x not in value]
-        return join_automatas(*[simple_automata(x, []) for x in value])
+        return class_automata(CharClass.of(string.printable) - bracket_class(value), [])
         
 
 class SymbolInBracketsNode(AtomicNode):
@@ -115,5 +115,5 @@ class ConcatInBracketsNode(BinaryNode):
 
 class RangeNode(BinaryNode):
     
-    def operate(self, left_value: chr, right_value: chr):
-        return [x for x in range(left_value, right_value + 1)]
+    def operate(self, left_value: int, right_value: int):
+        return left_value, right_value
@@ -0,0 +1,62 @@
+import hashlib
+import importlib.util
+import marshal
+import os
+from pathlib import Path
+
+# Bumped when the way programs are compiled changes, to drop the code objects cached before
+compiler_version = 1
+# Code objects kept in the cache, the least recently used are removed beyond it
+cache_size = 32
+
+
+def code_hash(source: str, filename: str) -> str:
+    digest = hashlib.sha256()
+    digest.update(importlib.util.MAGIC_NUMBER)
+    digest.update(str(compiler_version).encode())
+    digest.update(filename.encode())
+    digest.update(source.encode())
+    return digest.hexdigest()
+
+
+def load_code(source: str, filename: str, path=None):
+    """
+    Compiles the source of a program, reusing the code object marshalled in path when the same source was compiled
+    before.
+    """
+    if path is None:
+        return compile(source, filename, 'exec')
+    file = Path(path) / code_hash(source, filename)
+    try:
+        code = marshal.loads(file.read_bytes())
+        os.utime(file)
+        return code
+    except (FileNotFoundError, EOFError, ValueError, TypeError):
+        pass
+    code = compile(source, filename, 'exec')
+    os.makedirs(path, exist_ok=True)
+    file.write_bytes(marshal.dumps(code))
+    cached = sorted(Path(path).iterdir(), key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in cached[cache_size:]:
+        entry.unlink(missing_ok=True)
+    return code
+
+
+def runtime_namespace() -> dict:
+    """
+    Globals of a program run as __main__, holding what "from builtin import *" brings from the runtime.
+    """
+    import src
+    names = getattr(src, '__all__', [name for name in vars(src) if not name.startswith('_')])
+    namespace = {name: getattr(src, name) for name in names}
+    namespace['__name__'] = '__main__'
+    return namespace
+
+
+def run(code: [str], filename: str, path=None) -> None:
+    """
+    Runs the transpiled lines of a program in this process, with the runtime imported by the compiler.
+    """
+    # The import line is left blank to keep the line numbers of the generated file, and of its source map
+    source = '\n'.join(['', '\n', *code])
+    exec(load_code(source, filename, path), runtime_namespace())
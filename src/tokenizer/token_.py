@@ -2,12 +2,26 @@ from tokenizer.token_type import TokenType
 
 
 class Token:
+    """
+    Lexeme stored as an offset and a length into the shared source, its text is only sliced out when it is read.
+    """
+    __slots__ = ('line', 'column', 'type', 'source', 'start', 'length')
 
-    def __init__(self, line: int, column: int, token_type: TokenType, text: str):
+    def __init__(self, line: int, column: int, token_type: TokenType, source: str, start: int = 0, end: int = None):
         self.line: int = line
         self.column: int = column
         self.type: TokenType = token_type
-        self.text: str = text
+        self.source: str = source
+        self.start: int = start
+        self.length: int = (len(source) if end is None else end) - start
+
+    @property
+    def end(self) -> int:
+        return self.start + self.length
+
+    @property
+    def text(self) -> str:
+        return self.source[self.start:self.start + self.length]
 
     def __str__(self):
         return f"{self.__class__}(type: {self.type}, text: \"{self.text}\")"
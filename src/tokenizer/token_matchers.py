@@ -1,6 +1,30 @@
 from tokenizer.tokenizer import TokenMatcher
 from tokenizer.token_type import TokenType
 
+keywords = {
+    'var': TokenType.VAR,
+    'attr': TokenType.ATTR,
+    'class': TokenType.CLASS,
+    'fun': TokenType.FUN,
+    'if': TokenType.IF,
+    'else': TokenType.ELSE,
+    'for': TokenType.FOR,
+    'while': TokenType.WHILE,
+    'null': TokenType.NULL,
+    'true': TokenType.TRUE,
+    'false': TokenType.FALSE,
+    'return': TokenType.RETURN,
+    'break': TokenType.BREAK,
+    'continue': TokenType.CONTINUE,
+    'and': TokenType.AND,
+    'or': TokenType.OR,
+    'switch': TokenType.SWITCH,
+    'case': TokenType.CASE,
+    'default': TokenType.DEFAULT,
+    'this': TokenType.SELF,
+    'super': TokenType.SUPER,
+}
+
 matches = [
     TokenMatcher('//[^\n]*', TokenType.COMMENT),
     TokenMatcher(r'\d+', TokenType.INTEGER),
@@ -17,29 +41,8 @@ matches = [
     TokenMatcher(r'\}', TokenType.CLOSE_BRACES),
     TokenMatcher(r'\[', TokenType.OPEN_BRACKETS),
     TokenMatcher(r'\]', TokenType.CLOSE_BRACKETS),
-    TokenMatcher(r'var', TokenType.VAR),
-    TokenMatcher(r'attr', TokenType.ATTR),
-    TokenMatcher(r'class', TokenType.CLASS),
-    TokenMatcher(r'fun', TokenType.FUN),
-    TokenMatcher(r'if', TokenType.IF),
-    TokenMatcher(r'else', TokenType.ELSE),
-    TokenMatcher(r'for', TokenType.FOR),
-    TokenMatcher(r'while', TokenType.WHILE),
-    TokenMatcher(r'null', TokenType.NULL),
-    TokenMatcher(r'true', TokenType.TRUE),
-    TokenMatcher(r'false', TokenType.FALSE),
-    TokenMatcher(r'return', TokenType.RETURN),
-    TokenMatcher(r'break', TokenType.BREAK),
-    TokenMatcher(r'continue', TokenType.CONTINUE),
     TokenMatcher(r'&&', TokenType.AND),
     TokenMatcher(r'\|\|', TokenType.OR),
-    TokenMatcher(r'and', TokenType.AND),
-    TokenMatcher(r'or', TokenType.OR),
-    TokenMatcher('switch', TokenType.SWITCH),
-    TokenMatcher('case', TokenType.CASE),
-    TokenMatcher('default', TokenType.DEFAULT),
-    TokenMatcher(r'this', TokenType.SELF),
-    TokenMatcher(r'super', TokenType.SUPER),
     TokenMatcher(r'>=', TokenType.GREATER_EQUAL),
     TokenMatcher(r'<=', TokenType.LESS_EQUAL),
     TokenMatcher(r'>', TokenType.GREATER),
@@ -48,7 +51,7 @@ matches = [
     TokenMatcher(r'==', TokenType.EQUAL_EQUAL),
     TokenMatcher(r'!=', TokenType.EQUAL_DIFFERENT),
     TokenMatcher(r'=', TokenType.EQUAL),
-    TokenMatcher(r'[a-zA-Z_]+(\w|_)*', TokenType.IDENTIFIER),
+    TokenMatcher(r'[a-zA-Z_]+(\w|_)*', TokenType.IDENTIFIER, keywords),
     TokenMatcher(r'\.', TokenType.DOT),
     TokenMatcher(r',', TokenType.COMMA),
     TokenMatcher(r';', TokenType.SEMICOLON),
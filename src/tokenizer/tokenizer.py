@@ -1,19 +1,35 @@
 import os
 import pickle
+import re
+from array import array
+from concurrent.futures import ProcessPoolExecutor
 
 from tokenizer.token_type import TokenType
 from tokenizer.token_ import Token
 from automata.automata import Automata
 from typing import List
 
-from regex.regex_ import compile_regex
+from regex.regex_ import compile_regex, regex_automata
 from regex.automata_creation import join_automatas
 
+# Strings and comments, skipped when looking for line breaks to split a program at. A quote preceded by a
+# backslash does not close a string, the same as in the string token.
+literals = re.compile(r'"(?:[^"]|(?<=\\)")*"|//[^\n]*')
+
+# Comments are only kept after these tokens.
+comment_anchors = [TokenType.COMMENT, TokenType.SEMICOLON, TokenType.OPEN_BRACES]
+
+token_types = list(TokenType)
+
 
 class TokenMatcher:
-    def __init__(self, regex: str, token_type: TokenType):
+    """
+    Regex of a token type. Lexemes of the type that appear in keywords are reclassified to the keyword's type.
+    """
+    def __init__(self, regex: str, token_type: TokenType, keywords: {str: TokenType} = None):
         self.regex = regex
         self.token_type = token_type
+        self.keywords = keywords or {}
         self._automata = None
     
     @property
@@ -27,16 +43,22 @@ class TokenMatcher:
         self._automata = automata
     
     def __hash__(self):
-        return hash((self.regex, self.token_type))
+        return hash((self.regex, self.token_type, frozenset(self.keywords.items())))
     
     def __eq__(self, other):
-        return isinstance(other, TokenMatcher) and self.regex == other.regex and self.token_type == other.token_type
+        return isinstance(other, TokenMatcher) and self.regex == other.regex and self.token_type == other.token_type \
+            and self.keywords == other.keywords
 
 
 class Tokenizer:
-    def __init__(self, token_matchers: List[TokenMatcher], path=None):
+    def __init__(self, token_matchers: List[TokenMatcher], path=None, lazy=False):
         loaded = False
-        if path:
+        if lazy:
+            # The DFA states are built while tokenizing, so there is nothing to load or cache
+            self.automata = join_automatas(*[regex_automata(matcher.regex).add_type((matcher.token_type, i))
+                                             for i, matcher in enumerate(token_matchers)]).lazy_dfa()
+            loaded = True
+        elif path:
             try:
                 old_token_matchers = pickle.load(open(f'{path}/token_matchers.pkl', 'rb'))
                 if old_token_matchers == token_matchers:
@@ -53,11 +75,48 @@ class Tokenizer:
                 os.makedirs(path, exist_ok=True)
                 pickle.dump(self.automata, open(f'{path}/tokenizer_automata.pkl', 'wb'))
                 pickle.dump(self.token_matchers, open(f'{path}/token_matchers.pkl', 'wb'))
+        self.keywords = {matcher.token_type: matcher.keywords for matcher in token_matchers if matcher.keywords}
+        if lazy:
+            self.get_type = self.automata.get_type
+        else:
+            self.get_type = {state: self.automata.get_type(state) for state in self.automata.final_states}.get
     
-    def tokenize(self, program: str) -> [Token]:
+    def tokenize(self, program: str, workers: int = 1) -> [Token]:
+        if workers > 1:
+            return self.parallel_tokenize(program, workers)
         return self.automata_tokenize(program)
     
-    def automata_tokenize(self, program: str) -> [Token]:
+    def parallel_tokenize(self, program: str, workers: int, min_chunk: int = 1 << 16) -> [Token]:
+        """
+        Tokenizes chunks of the program in a process pool. Chunks start at line breaks outside strings and
+        comments, so the tokens are the same as the sequential ones once their lines are shifted.
+        """
+        bounds = [0, *split_points(program, min(workers, len(program) // min_chunk)), len(program)]
+        if len(bounds) == 2:
+            return self.automata_tokenize(program)
+        try:
+            with ProcessPoolExecutor(workers, initializer=init_worker, initargs=(self,)) as pool:
+                chunks = list(pool.map(tokenize_chunk, [program[start:end] for start, end in zip(bounds, bounds[1:])]))
+        except Exception:
+            # Lexical errors are reported by the sequential tokenizer, with their position in the whole program
+            return self.automata_tokenize(program)
+        
+        tokens = []
+        line = 1
+        for offset, (types, starts, lengths, lines, columns) in zip(bounds, chunks):
+            keep_comments = bool(tokens) and tokens[-1].type in comment_anchors
+            for k in range(len(types) - 1):
+                token_type = token_types[types[k]]
+                if token_type == TokenType.COMMENT and not keep_comments:
+                    continue
+                keep_comments = True
+                start = starts[k] + offset
+                tokens.append(Token(lines[k] + line - 1, columns[k], token_type, program, start, start + lengths[k]))
+            line += lines[-1] - 1
+        tokens.append(Token(line, columns[-1], TokenType.EOF, program, len(program), len(program)))
+        return tokens
+    
+    def automata_tokenize(self, program: str, previous: TokenType = None) -> [Token]:
         tokens = []
         line = column = 1
         i = 0
@@ -67,12 +126,13 @@ class Tokenizer:
             if length == 0:
                 raise Exception(f"Unexpected character '{program[i]}' at line: {line} column: {column}")
             
-            match = program[i: i + length]
+            start = i
             i += length
-            token_type = self.automata.get_type(self.automata.current)
+            token_type = self.get_type(self.automata.current)
+            if token_type in self.keywords:
+                token_type = self.keywords[token_type].get(program[start:i], token_type)
             
-            if token_type == TokenType.COMMENT and \
-                    (not tokens or tokens[-1].type not in [TokenType.COMMENT, TokenType.SEMICOLON, TokenType.OPEN_BRACES]):
+            if token_type == TokenType.COMMENT and (tokens[-1].type if tokens else previous) not in comment_anchors:
                 continue
             
             if token_type == TokenType.LINEBREAK:
@@ -88,8 +148,51 @@ class Tokenizer:
                 column += 4
                 continue
             
-            tokens.append(Token(line, column, token_type, match))
+            tokens.append(Token(line, column, token_type, program, start, i))
             column += length
         
-        tokens.append(Token(line, column + 1, TokenType.EOF, ""))
+        tokens.append(Token(line, column + 1, TokenType.EOF, program, i, i))
         return tokens
+
+
+def split_points(program: str, chunks: int) -> [int]:
+    """
+    Line breaks outside strings and comments that split the program in about chunks equal parts.
+    """
+    points = []
+    matches = literals.finditer(program)
+    literal = next(matches, None)
+    for k in range(1, chunks):
+        point = program.find('\n', max(len(program) * k // chunks, points[-1] + 1 if points else 0))
+        while point != -1:
+            while literal and literal.end() <= point:
+                literal = next(matches, None)
+            if not literal or literal.start() > point:
+                break
+            point = program.find('\n', literal.end())
+        if point == -1:
+            break
+        points.append(point)
+    return points
+
+
+worker_tokenizer: Tokenizer | None = None
+
+
+def init_worker(tokenizer: Tokenizer):
+    global worker_tokenizer
+    worker_tokenizer = tokenizer
+
+
+def tokenize_chunk(chunk: str) -> (array, array, array, array, array):
+    """
+    Tokenizes a chunk in a worker and sends the tokens back as arrays of type indexes, starts, lengths, lines and
+    columns. Comments at the start of the chunk are kept, whether they follow an anchor is only known when merging.
+    """
+    tokens = worker_tokenizer.automata_tokenize(chunk, previous=TokenType.COMMENT)
+    if any(token.type is None for token in tokens):
+        raise Exception("Unrecognized token")
+    indexes = {token_type: i for i, token_type in enumerate(token_types)}
+    return (array('B', [indexes[token.type] for token in tokens]), array('q', [token.start for token in tokens]),
+            array('q', [token.length for token in tokens]), array('q', [token.line for token in tokens]),
+            array('q', [token.column for token in tokens]))
@@ -10,9 +10,9 @@ def _declaring_class(obj: type):
     return name[:name.rfind('.')]
 
 
-def _visitor_impl(self, arg, **kwargs):
+def _visitor_impl(self, arg, *args, **kwargs):
     method = _methods[(_name(type(self)), type(arg))]
-    return method(self, arg, **kwargs)
+    return method(self, arg, *args, **kwargs)
 
 
 def visitor(arg_type):
@@ -0,0 +1,38 @@
+import json
+
+
+class SourceMap:
+    """
+    Lines of a generated program mapped to the line and column of the source they were transpiled from, and the
+    functions it defines by the line of their def.
+    """
+
+    def __init__(self, source: str, generated: str, lines: {int: (int, int)}, functions: {int: str}):
+        self.source = source
+        self.generated = generated
+        self.lines = lines
+        self.functions = functions
+
+    def locate(self, line: int) -> tuple | None:
+        return self.lines.get(line)
+
+    def function(self, line: int) -> str | None:
+        """
+        Name of the function, or Class.method, whose code starts at the generated line.
+        """
+        return self.functions.get(line)
+
+    def save(self, path) -> None:
+        with open(path, 'w') as f:
+            json.dump({'source': self.source, 'generated': self.generated,
+                       'lines': {str(line): list(position) for line, position in self.lines.items()},
+                       'functions': {str(line): name for line, name in self.functions.items()}}, f)
+
+    @staticmethod
+    def load(path) -> 'SourceMap':
+        with open(path) as f:
+            data = json.load(f)
+        return SourceMap(data['source'], data['generated'],
+                         {int(line): tuple(position) for line, position in data['lines'].items()},
+                         {int(line): name for line, name in data['functions'].items()})
+
@@ -1,21 +1,164 @@
 from _parser.nodes import *
+from builtin._types import String, Null
+from builtin.builtin import Builtins
+from optimizer.passes import nodes
+from tokenizer.token_ import Token
 from tokenizer.token_type import TokenType
 from tools import visitor
+from .source_map import SourceMap
+
+
+# Cache of the case taken by a switch for each type of value. A type is matched once against the case classes in
+# order, the first one it derives from gives the case, and the number of cases stands for the default.
+switch_cache = """
+
+class {name}(dict):
+
+	def __init__(self, cases):
+		super().__init__()
+		self.cases = cases
+
+	def __missing__(self, kind):
+		cases = self.cases()
+		index = next((i for i, case in enumerate(cases) if issubclass(kind, case)), len(cases))
+		self[kind] = index
+		return index
+
+"""
+
+# Counters of the instrumented functions, written as JSON when the program exits. The time of a call less the time
+# of the instrumented calls made inside it is its self time, and recursive calls only add to the cumulative time
+# of the outermost one.
+instrumentation = """
+
+import atexit as _atexit
+import functools as _functools
+import json as _json
+from time import perf_counter_ns as _perf_counter_ns
+{allocations_import}
+# Calls, cumulative and self nanoseconds, net allocated bytes and active calls of each function
+_counters = {{}}
+# Nanoseconds spent in the instrumented functions called by each active call
+_callees = [0]
+
+
+def _instrumented(name):
+	counter = _counters.setdefault(name, [0, 0, 0, 0, 0])
+
+	def decorator(function):
+		@_functools.wraps(function)
+		def wrapper(*args, **kwargs):
+			counter[4] += 1
+			_callees.append(0)
+{allocations_start}			start = _perf_counter_ns()
+			try:
+				return function(*args, **kwargs)
+			finally:
+				elapsed = _perf_counter_ns() - start
+				callees = _callees.pop()
+				_callees[-1] += elapsed
+				counter[0] += 1
+				counter[2] += elapsed - callees
+				counter[4] -= 1
+				if not counter[4]:
+					counter[1] += elapsed
+{allocations_end}		return wrapper
+	return decorator
+
+
+@_atexit.register
+def _dump_instrumentation():
+	functions = {{}}
+	for name, counter in sorted(_counters.items(), key=lambda item: -item[1][1]):
+		if counter[0]:
+			functions[name] = {{'calls': counter[0], 'cumulative_ns': counter[1], 'self_ns': counter[2]{allocations_field}}}
+	with open({path!r}, 'w') as f:
+		_json.dump(functions, f, indent=2)
+
+"""
+
+# Lines of the instrumentation that also count the bytes allocated by each function, with tracemalloc
+instrumented_allocations = {
+    'allocations_import': "import tracemalloc as _tracemalloc\n"
+                          "_tracemalloc.start()\n"
+                          "_traced_memory = _tracemalloc.get_traced_memory\n",
+    'allocations_start': "\t\t\tallocated = _traced_memory()[0]\n",
+    'allocations_end': "\t\t\t\t\tcounter[3] += _traced_memory()[0] - allocated\n",
+    'allocations_field': ", 'allocated_bytes': counter[3]",
+}
 
 
 class Transpiler:
 
-    def __init__(self):
+    def __init__(self, types: {int: type} = None, intrinsics: bool = False, slots: bool = False,
+                 dispatch: bool = False, instrument: str = None, allocations: bool = False):
         self.lines: [str] = []
+        # Types recorded by the checker, keyed by node id. Nodes without one are transpiled from their text alone.
+        self.types: {int: type} = types if types is not None else {}
+        self.lower = intrinsics
+        # Module level definitions needed by the lowered calls
+        self.header: {str: str} = {}
+        self.slots = slots
+        self.dispatch = dispatch
+        self.switches = 0
+        # File the instrumented program writes its counters to, functions are only wrapped when it is given
+        self.instrument = instrument
+        self.allocations = allocations
+        self.classes: {str: ClassNode} = {}
+        # Source token of the generated lines and the functions defined by them, keyed by index in self.lines
+        self.positions: {int: Token} = {}
+        self.functions: {int: str} = {}
+        self.owner: str | None = None
+        # Identifiers of the program, generated helpers are renamed away from them
+        self.names: {str} = set()
 
     def transpile(self, expressions: [Node]):
         self.lines = []
+        self.header = {}
+        self.switches = 0
+        self.positions = {}
+        self.functions = {}
+        self.names = identifiers(expressions)
+        self.classes = {node.code.name.text: node.code for node in expressions if isinstance(node.code, ClassNode)}
         for expression in expressions:
             expression.eval(self)
             self.lines.append('')
         self.lines.append("if __name__ == '__main__':\n\tmain()\n")
+        if self.header:
+            header = sorted(self.header.values(), key=lambda line: not line.startswith('from '))
+            self.lines = [*header, '', '', *self.lines]
+            shift = len(header) + 2
+            self.positions = {index + shift: token for index, token in self.positions.items()}
+            self.functions = {index + shift: name for index, name in self.functions.items()}
         return self.lines
 
+    def source_map(self, source: str, generated: str, offset: int = 0) -> SourceMap:
+        """
+        Source map of the last transpiled program, written to the generated file after offset lines.
+        """
+        lines = {}
+        functions = {}
+        line = offset + 1
+        for index, entry in enumerate(self.lines):
+            count = entry.count('\n') + 1
+            if index in self.positions:
+                token = self.positions[index]
+                for generated_line in range(line, line + count):
+                    lines[generated_line] = (token.line, token.column)
+            if index in self.functions:
+                functions[line] = self.functions[index]
+            line += count
+        return SourceMap(source, generated, lines, functions)
+
+    def locate(self, node: Node, start: int) -> None:
+        """
+        Maps the lines generated for the node since start, which no node inside it took, to its first token.
+        """
+        token = leading_token(node)
+        if token:
+            for index in range(start, len(self.lines)):
+                self.positions.setdefault(index, token)
+
     @visitor(ContinueNode)
     def check(self, expression: ContinueNode, tabs: int = 0):
         return "continue"
@@ -26,6 +169,8 @@ class Transpiler:
 
     @visitor(SwitchNode)
     def eval(self, statement: SwitchNode, tabs: int = 0):
+        if self.dispatch:
+            return self.eval_dispatch(statement, tabs)
         tabs_string = "\t"*tabs
         self.lines.append(f"{tabs_string}match {statement.variable.text}:")
         for i in statement.switch_cases:
@@ -42,10 +187,12 @@ class Transpiler:
     @visitor(Statement)
     def eval(self, statement: Statement, tabs: int = 0):
         tabs_str = '\t' * tabs
+        start = len(self.lines)
         result = statement.code.eval(self, tabs=tabs)
         if result:
             for line in result.split("\n"):
                 self.lines.append(f"{tabs_str}{line}")
+        self.locate(statement, start)
 
     @visitor(Literal)
     def eval(self, literal: Literal, tabs: int = 0):
@@ -90,6 +237,10 @@ class Transpiler:
         if binary.operator.type == TokenType.MINUS:
             return f'{left} - {right}'
         if binary.operator.type == TokenType.PLUS:
+            if id(binary) in self.types:
+                if self.types[id(binary)] is String:
+                    return self.format_string(binary)
+                return f'{left} + {right}'
             if self.value_is_str(left) or self.value_is_str(right):
                 if not self.value_is_str(left):
                     left = f'str({left})'
@@ -103,11 +254,11 @@ class Transpiler:
         if binary.operator.type == TokenType.EQUAL_EQUAL:
             if left == 'None':
                 left, right = right, left
-            return f'{left} {"is" if right == "None" else "=="} {right}'
+            return f'{left} {"is" if self.is_null(binary, right) else "=="} {right}'
         if binary.operator.type == TokenType.EQUAL_DIFFERENT:
             if left == 'None':
                 left, right = right, left
-            return f'{left} {"is not" if right == "None" else "!="} {right}'
+            return f'{left} {"is not" if self.is_null(binary, right) else "!="} {right}'
         if binary.operator.type == TokenType.LESS:
             return f'{left} < {right}'
         if binary.operator.type == TokenType.LESS_EQUAL:
@@ -147,6 +298,10 @@ class Transpiler:
         arguments = []
         for arg in expression.arguments:
             arguments.append(arg.eval(self))
+        if self.lower and isinstance(expression.called, Variable) and called in self.intrinsics:
+            lowered = self.intrinsics[called](self, expression.arguments, arguments)
+            if lowered:
+                return lowered
         return f'{called}({", ".join(arguments)})'
 
     @visitor(GetNode)
@@ -158,12 +313,16 @@ class Transpiler:
         text = f"class {expression.name.text}:\n"
         if expression.superclass:
             text = f"class {expression.name.text}({expression.superclass.text}):\n"
-        if not expression.methods:
+        if self.slots:
+            text += f"\t__slots__ = {self.class_slots(expression)!r}\n"
+        if not expression.methods and not self.slots:
             text += "\tpass\n"
             return text
         self.lines.append(text)
+        self.owner = expression.name.text
         for method in expression.methods:
             method.eval(self, tabs=tabs + 1)
+        self.owner = None
 
     @visitor(SelfNode)
     def eval(self, expression: SelfNode, tabs: int = 0):
@@ -186,11 +345,16 @@ class Transpiler:
             params = ["self", *list(params)]
             if expression.name.text == "init":
                 function_name = "__init__"
+        start = len(self.lines)
+        self.functions[start] = f'{self.owner}.{function_name}' if tabs > 0 and self.owner else function_name
+        if self.instrument:
+            self.instrumented(self.functions[start], tabs)
         self.lines.append(f'{tabs_str}def {function_name}({", ".join(params)}):')
         self.eval_block(expression.body, tabs + 1)
         if not expression.body:
             self.lines.append(f'{tabs_str}\tpass')
         self.lines.append("")
+        self.locate(expression, start)
 
     @visitor(Return)
     def eval(self, expression: Return, tabs=0):
@@ -230,10 +394,199 @@ class Transpiler:
             self.lines.append(f'{tabs_str}\tpass')
         self.eval_block(expression.statements, tabs + 1)
 
+    def eval_dispatch(self, statement: SwitchNode, tabs: int = 0):
+        """
+        Finds the case of the switch in a cache keyed by the type of the value, and branches to it with a binary
+        search over the case numbers.
+        """
+        tabs_str = '\t' * tabs
+        name = self.helper(f'_switch{self.switches}')
+        self.switches += 1
+        classes = [case.text for case in statement.switch_cases]
+        cache = self.helper('_Switch')
+        self.header['_Switch'] = switch_cache.format(name=cache)
+        self.header[name] = f"{name} = {cache}(lambda: ({', '.join(classes)},))"
+        case = self.helper('_case')
+        self.lines.append(f'{tabs_str}{case} = {name}[type({statement.variable.text})]')
+        self.eval_cases([*statement.switch_cases.values(), statement.default], 0, len(classes) + 1, tabs, case)
+
+    def eval_cases(self, cases: [[Node]], start: int, end: int, tabs: int, case: str):
+        tabs_str = '\t' * tabs
+        if end - start == 1:
+            self.eval_block(cases[start], tabs)
+            if not cases[start]:
+                self.lines.append(f'{tabs_str}pass')
+        elif end - start == 2:
+            self.lines.append(f'{tabs_str}if {case} == {start}:')
+            self.eval_cases(cases, start, start + 1, tabs + 1, case)
+            if cases[start + 1]:
+                self.lines.append(f'{tabs_str}else:')
+                self.eval_cases(cases, start + 1, end, tabs + 1, case)
+        else:
+            middle = (start + end) // 2
+            self.lines.append(f'{tabs_str}if {case} < {middle}:')
+            self.eval_cases(cases, start, middle, tabs + 1, case)
+            self.lines.append(f'{tabs_str}else:')
+            self.eval_cases(cases, middle, end, tabs + 1, case)
+
+    def instrumented(self, name: str, tabs: int) -> None:
+        """
+        Wraps the function defined next with the counters of the instrumentation.
+        """
+        fields = instrumented_allocations if self.allocations else dict.fromkeys(instrumented_allocations, '')
+        self.header['_instrumented'] = instrumentation.format(path=self.instrument, **fields)
+        tabs_str = '\t' * tabs
+        self.lines.append(f"{tabs_str}@_instrumented({name!r})")
+
     def eval_block(self, statements, tabs: int = 0):
         for statement in statements:
             self.eval(statement, tabs=tabs)
-            
+
+    def is_null(self, binary: Binary, right: str) -> bool:
+        """
+        Whether a comparison is a null check, which is known from the operand types when they were recorded.
+        """
+        if id(binary) in self.types:
+            return self.types.get(id(binary.left)) is Null or self.types.get(id(binary.right)) is Null
+        return right == 'None'
+
+    def format_string(self, binary: Binary) -> str:
+        """
+        Builds a chain of string concatenations as a single f-string. Falls back to converting and adding the
+        operands when one of them can't be placed in an f-string replacement field, or a literal holds an escape
+        or a quote.
+        """
+        operands = []
+        self.concatenated(binary, operands)
+        text = []
+        for operand in operands:
+            if isinstance(operand, Literal):
+                if isinstance(operand.value, str):
+                    # Escapes and quotes are kept as written by falling back to the concatenation
+                    if any(c in operand.value[1:-1] for c in '\'"\\'):
+                        return self.concatenation(operands)
+                    text.append(operand.value[1:-1].replace('{', '{{').replace('}', '}}'))
+                else:
+                    text.append(str(operand.value))
+                continue
+            code = operand.eval(self)
+            if any(c in code for c in '\'"{}:\n\\'):
+                return self.concatenation(operands)
+            text.append(f'{{{code}}}')
+        return "f'" + ''.join(text) + "'"
+
+    def concatenation(self, operands: [Node]) -> str:
+        return ' + '.join(self.string_operand(operand) for operand in operands)
+
+    def concatenated(self, expression: Node, operands: [Node]) -> None:
+        while isinstance(expression, Grouping):
+            expression = expression.expression
+        if isinstance(expression, Binary) and expression.operator.type == TokenType.PLUS and \
+                self.types.get(id(expression)) is String:
+            self.concatenated(expression.left, operands)
+            self.concatenated(expression.right, operands)
+        else:
+            operands.append(expression)
+
+    def string_operand(self, operand: Node) -> str:
+        code = operand.eval(self)
+        if self.types.get(id(operand)) is String:
+            return code
+        return f'str({code})'
+
     @staticmethod
     def value_is_str(string: str):
         return string.startswith('"') or string.startswith('str(')
+
+    @staticmethod
+    def attributes(expression: ClassNode) -> [str]:
+        names = {}
+        for method in expression.methods:
+            for node in nodes(method):
+                if isinstance(node, AttrDeclaration):
+                    names[node.name.text] = None
+        return list(names)
+
+    def class_slots(self, expression: ClassNode) -> (str,):
+        """
+        Attributes declared by the class that are not already defined by its base classes, in the program or in
+        the runtime.
+        """
+        inherited = set()
+        base = expression.superclass
+        while base and base.text in self.classes:
+            inherited.update(self.attributes(self.classes[base.text]))
+            base = self.classes[base.text].superclass
+        if base:
+            inherited.update(Builtins().members(base.text))
+        return tuple(name for name in self.attributes(expression) if name not in inherited)
+
+    @staticmethod
+    def is_simple(node: Node) -> bool:
+        """
+        Whether the expression can be evaluated twice at no cost: a literal, a variable or an attribute of one.
+        """
+        while isinstance(node, GetNode):
+            node = node.left
+        return isinstance(node, Literal | Variable | SelfNode)
+
+    @staticmethod
+    def number(node: Node) -> int | float | None:
+        """
+        Value of a number literal, or of the division of two of them.
+        """
+        while isinstance(node, Grouping):
+            node = node.expression
+        if isinstance(node, Literal) and isinstance(node.value, int | float) and not isinstance(node.value, bool):
+            return node.value
+        if isinstance(node, Binary) and node.operator.type == TokenType.DIVIDE:
+            left, right = Transpiler.number(node.left), Transpiler.number(node.right)
+            if left is not None and right:
+                return left / right
+        return None
+
+    def helper(self, name: str) -> str:
+        """
+        Name for a generated helper that no identifier of the program uses.
+        """
+        while name in self.names:
+            name += '_'
+        return name
+
+    def lower_pow(self, nodes: [Node], arguments: [str]) -> str | None:
+        exponent = self.number(nodes[1])
+        if exponent == 2 and isinstance(exponent, int):
+            if self.is_simple(nodes[0]):
+                return f'({arguments[0]} * {arguments[0]})'
+            return f'({arguments[0]}) ** 2'
+        if exponent == 0.5:
+            name = self.helper('_sqrt')
+            self.header['sqrt'] = f'from math import sqrt as {name}'
+            return f'{name}({arguments[0]})'
+        return None
+
+    def lower_max(self, nodes: [Node], arguments: [str]) -> str | None:
+        # max returns its first argument unless the second is greater
+        if self.is_simple(nodes[0]) and self.is_simple(nodes[1]):
+            return f'({arguments[1]} if {arguments[1]} > {arguments[0]} else {arguments[0]})'
+        return None
+
+    def lower_min(self, nodes: [Node], arguments: [str]) -> str | None:
+        if self.is_simple(nodes[0]) and self.is_simple(nodes[1]):
+            return f'({arguments[1]} if {arguments[1]} < {arguments[0]} else {arguments[0]})'
+        return None
+
+    def lower_golden(self, nodes: [Node], arguments: [str]) -> str:
+        name = self.helper('_GOLDEN')
+        self.header['golden'] = f'{name} = golden()'
+        return name
+
+    def lower_infinity(self, nodes: [Node], arguments: [str]) -> str:
+        name = self.helper('_INFINITY')
+        self.header['infinity'] = f'{name} = infinity()'
+        return name
+
+    # Builtin calls that are lowered to cheaper code when intrinsics are enabled. A lowering that returns None
+    # keeps the call.
+    intrinsics = {'pow': lower_pow, 'max': lower_max, 'min': lower_min, 'golden': lower_golden,
+                  'infinity': lower_infinity}
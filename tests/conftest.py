@@ -0,0 +1,42 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+src_path = Path(__file__).parent.parent
+
+
+class Compiler:
+    """
+    Runs the compiler on programs written to a temporary directory, as python3 src would from the command line.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.programs = 0
+
+    def __call__(self, program: str, *args: str) -> subprocess.CompletedProcess:
+        self.programs += 1
+        path = self.directory / f'program{self.programs}.kt'
+        path.write_text(program)
+        return subprocess.run([sys.executable, 'src', str(path), *args], cwd=src_path, capture_output=True, text=True)
+
+    def diagnostics(self, program: str) -> [dict]:
+        result = self(program, '--errors', 'json')
+        assert result.returncode == 1
+        return json.loads(result.stderr)
+
+    def run(self, program: str, *args: str) -> subprocess.CompletedProcess:
+        """
+        Compiles the program to out and runs it.
+        """
+        result = self(program, *args)
+        assert result.returncode == 0, result.stderr
+        return subprocess.run([sys.executable, 'out'], cwd=src_path, capture_output=True, text=True)
+
+
+@pytest.fixture
+def compiler(tmp_path) -> Compiler:
+    return Compiler(tmp_path)
@@ -0,0 +1,29 @@
+def test_unexpected_end_of_file_has_a_position(compiler):
+    program = "fun main(): Void {\n    print(1);\n"
+    [diagnostic] = compiler.diagnostics(program)
+    assert diagnostic['message'] == 'Unexpected token found ""'
+    assert (diagnostic['line'], diagnostic['column']) == (3, 1)
+
+    text = compiler(program).stderr.splitlines()
+    assert text[1:] == ['3|', '   ^']
+
+
+def test_unsupported_unary_operand_is_collected(compiler):
+    program = 'fun main(): Void {\n    var x: Int = -"a";\n    print(y);\n}\n'
+    diagnostics = compiler.diagnostics(program)
+    assert [(d['message'], d['line'], d['column']) for d in diagnostics] == [
+        ('Operator not supported for type String', 2, 17),
+        ('y not defined in current scope', 3, 10),
+    ]
+
+
+def test_undefined_switch_variable_is_collected(compiler):
+    program = ('class A { fun init(): Void { } }\n'
+               'fun main(): Void {\n'
+               '    switch y: case A { print(q); } default { print(2); }\n'
+               '}\n')
+    diagnostics = compiler.diagnostics(program)
+    assert [(d['message'], d['line'], d['column']) for d in diagnostics] == [
+        ('y not defined in current scope', 3, 11),
+        ('q not defined in current scope', 3, 29),
+    ]
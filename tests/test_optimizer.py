@@ -0,0 +1,85 @@
+import pytest
+
+# Programs that must print the same and fail with the same kind of error at every optimisation level
+programs = {
+    'null while operand': """
+fun f(x: Int): Int {
+    var i: Int = 0;
+    var y: Int = 0;
+    while (x != null && i < 3) { y = x * 2; i = i + 1; }
+    return y;
+}
+fun main(): Void {
+    print(f(null));
+    print(f(4));
+}
+""",
+    'null for iterable': """
+class Box {
+    fun init(): Void { attr items: List<Int> = null; }
+}
+fun total(b: Box, k: Int): Int {
+    var t: Int = 0;
+    for (var e: b.items) { t = t + k * 2 + e; }
+    return t;
+}
+fun main(): Void {
+    var b: Box = Box();
+    b.items = [1, 2];
+    print(total(b, 3));
+    b.items = [];
+    print(total(b, 3));
+    print("before");
+    b.items = null;
+    print(total(b, 3));
+    print("after");
+}
+""",
+    'folded and hoisted arithmetic': """
+fun main(): Void {
+    var n: Int = 10;
+    var k: Int = 3;
+    var s: Float = 0;
+    var i: Int = 0;
+    while (i < n * 2) {
+        s = s + k * 2 + (n - 1) / 2 + i;
+        var j: Int = 0;
+        while (j < 3) { s = s + (k + 1) * j; j = j + 1; }
+        i = i + 1;
+    }
+    print(s);
+    for (var v: [1, 2, 3]) { print(v * (k - 1) - k * 2); }
+    print(-(3) * -2 + 7 % 4 - 10 / 4);
+    print("v" + (2 + 3) + -1.5);
+    print(golden());
+}
+""",
+    'lowered calls next to program names like their helpers': """
+fun _sqrt(x: Float): Float { return x + 100; }
+fun main(): Void {
+    var _GOLDEN: Int = 5;
+    var _INFINITY: Int = 6;
+    var _sqrt_: Float = pow(16, 0.5);
+    print(_sqrt_);
+    print(_sqrt(1));
+    print(golden() + _GOLDEN);
+    print(_INFINITY);
+    print(infinity() > 0);
+}
+""",
+}
+
+
+def outcome(result) -> (str, str):
+    """
+    What the program printed, and the type of the error it stopped with.
+    """
+    error = result.stderr.strip().splitlines()[-1].split(':')[0] if result.stderr.strip() else None
+    return result.stdout, error
+
+
+@pytest.mark.parametrize('name', programs)
+def test_levels_agree(compiler, name):
+    outcomes = [outcome(compiler.run(programs[name], f'-O{level}')) for level in (0, 1, 2)]
+    assert outcomes[1] == outcomes[0]
+    assert outcomes[2] == outcomes[0]
@@ -0,0 +1,25 @@
+import subprocess
+import sys
+
+from conftest import src_path
+
+program = """class Box {
+    fun init(): Void { attr items: List<Int> = null; }
+}
+fun main(): Void {
+    var b: Box = Box();
+    print("start");
+    for (var e: b.items) { print(e); }
+}
+"""
+
+
+def test_run_traceback_maps_to_the_program(compiler):
+    result = compiler(program, '--run')
+    assert result.stdout == 'start\n'
+    assert result.stderr.splitlines()[-1] == "TypeError: 'NoneType' object is not iterable"
+
+    report = subprocess.run([sys.executable, 'tools/profile_report.py', '--traceback', '-'], input=result.stderr,
+                            cwd=src_path, capture_output=True, text=True)
+    path = compiler.directory / f'program{compiler.programs}.kt'
+    assert f'File "{path.resolve()}", line 7, column 4' in report.stdout
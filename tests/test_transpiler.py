@@ -0,0 +1,23 @@
+# Switch over classes and variables named like the helpers of the dispatch lowering
+switch_program = """
+class _Switch { fun init(): Void { } }
+class B: _Switch { fun init(): Void { super.init(); } }
+class C { fun init(): Void { } }
+fun name(_switch0: Object): Int {
+    var _case: Int = 10;
+    switch _switch0: case B { _case = _case + 2; } case _Switch { _case = _case + 1; } default { _case = 0; }
+    return _case;
+}
+fun main(): Void {
+    print(name(B()));
+    print(name(_Switch()));
+    print(name(C()));
+}
+"""
+
+
+def test_switch_strategies_agree(compiler):
+    match = compiler.run(switch_program, '--switch', 'match')
+    dispatch = compiler.run(switch_program, '--switch', 'dispatch')
+    assert match.stdout == '12\n11\n0\n'
+    assert dispatch.stdout == match.stdout
@@ -0,0 +1,100 @@
+"""
+Folds a cProfile of a transpiled program back onto the functions and lines of its .kt source, with the source map
+written next to the generated code. Runtime functions are listed with the program functions that call them.
+With --traceback, rewrites the generated locations of a traceback into source ones. Programs run with --run leave
+their source map in the same place, for the lines they report under the path of the .kt file.
+
+Usage:
+    python3 -m cProfile -o profile.out out/__main__.py
+    python3 tools/profile_report.py profile.out [--map out/source_map.json] [--sort cumulative|self|calls] [--limit N]
+    python3 tools/profile_report.py --traceback error.txt [--map out/source_map.json]
+    python3 src program.kt --run 2>&1 | python3 tools/profile_report.py --traceback -
+"""
+import argparse
+import os
+import pstats
+import re
+import sys
+from pathlib import Path
+
+src_path = Path(__file__).parent.parent
+sys.path.insert(0, str(src_path / 'src'))
+
+from transpiler.source_map import SourceMap
+
+# Generated locations in a traceback
+traceback_line = re.compile(r'File "(?P<file>[^"]+)", line (?P<line>\d+)')
+
+
+def program_function(source_map: SourceMap, function: (str, int, str)) -> str | None:
+    """
+    Source name and location of a profiled function, if it was generated from the program.
+    """
+    file, line, name = function
+    if file == '~' or os.path.realpath(file) != source_map.generated:
+        return None
+    position = source_map.locate(line)
+    location = f"{Path(source_map.source).name}:{position[0]}" if position else "<generated>"
+    return f"{source_map.function(line) or name} ({location})"
+
+
+def runtime_function(function: (str, int, str)) -> str | None:
+    file, line, name = function
+    if Path(file).parent.name != 'builtin':
+        return None
+    return f"{name} (builtin/{Path(file).name}:{line})"
+
+
+def profile_report(stats: pstats.Stats, source_map: SourceMap, sort: str, limit: int) -> str:
+    order = {'cumulative': 3, 'self': 2, 'calls': 1}[sort]
+    program = {}
+    runtime = {}
+    for function, (_, calls, own, cumulative, callers) in stats.stats.items():
+        name = program_function(source_map, function)
+        if name:
+            program[name] = (name, calls, own, cumulative)
+            continue
+        name = runtime_function(function)
+        if name:
+            callers = {program_function(source_map, caller) for caller in callers} - {None}
+            runtime[name] = (name, calls, own, cumulative, callers)
+
+    lines = [f"{'calls':>10} {'self s':>10} {'cumul s':>10}  program function"]
+    for name, calls, own, cumulative in sorted(program.values(), key=lambda row: -row[order])[:limit]:
+        lines.append(f"{calls:>10} {own:>10.3f} {cumulative:>10.3f}  {name}")
+    if runtime:
+        lines += ['', f"{'calls':>10} {'self s':>10} {'cumul s':>10}  runtime function <- called from"]
+        for name, calls, own, cumulative, callers in sorted(runtime.values(), key=lambda row: -row[order])[:limit]:
+            called_from = ', '.join(sorted(caller.split(' ')[0] for caller in callers))
+            lines.append(f"{calls:>10} {own:>10.3f} {cumulative:>10.3f}  {name} <- {called_from or '-'}")
+    return '\n'.join(lines)
+
+
+def map_traceback(text: str, source_map: SourceMap) -> str:
+    def replace(match: re.Match) -> str:
+        line = int(match['line'])
+        position = source_map.locate(line)
+        if not position or os.path.realpath(match['file']) != source_map.generated:
+            return match[0]
+        return f'File "{source_map.source}", line {position[0]}, column {position[1]} (generated line {line})'
+    return traceback_line.sub(replace, text)
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Reports a profile or a traceback of a transpiled program '
+                                                     'in terms of its .kt source.')
+    arg_parser.add_argument('profile', nargs='?', help='profile written by cProfile -o')
+    arg_parser.add_argument('--map', default=src_path / 'out/source_map.json', help='source map of the program')
+    arg_parser.add_argument('--sort', choices=['cumulative', 'self', 'calls'], default='cumulative')
+    arg_parser.add_argument('--limit', type=int, default=20, help='functions listed in each table')
+    arg_parser.add_argument('--traceback', help="file holding a traceback, or - for the standard input")
+    args = arg_parser.parse_args()
+
+    source_map = SourceMap.load(args.map)
+    if args.traceback:
+        text = sys.stdin.read() if args.traceback == '-' else Path(args.traceback).read_text()
+        print(map_traceback(text, source_map), end='')
+    elif args.profile:
+        print(profile_report(pstats.Stats(args.profile), source_map, args.sort, args.limit))
+    else:
+        arg_parser.error('a profile or --traceback is required')